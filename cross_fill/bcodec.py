@@ -0,0 +1,374 @@
+#!/root/venv/bin/python
+"""
+bcodec.py - cross_fill 和 bview 共用的纯 Python bencode 编解码，以及紧凑的 piece 位图
+用法:
+    import bcodec
+    d = bcodec.decode(raw)
+    raw = bcodec.encode(d)
+    python3 bcodec.py bench a.torrent b.fastresume ...   # 与 bencodepy 对比速度
+"""
+import os
+import re
+import sys
+import mmap
+import time
+
+
+class BencodeError(ValueError):
+    pass
+
+
+_DIGITS = frozenset(b"0123456789")
+_I, _L, _D, _E = b"ilde"
+# 整数不允许前导 0 和 -0，字符串长度不允许负数和前导 0；int() 能接受的空格、下划线等都不算合法
+_NUMBER_SYNTAX = {
+    b"e": re.compile(rb"0|-?[1-9][0-9]*"),
+    b":": re.compile(rb"0|[1-9][0-9]*"),
+}
+
+
+#
+# 解码：buf 可以是 bytes / bytearray / mmap，都支持 find 和按下标取字节
+#
+
+def _read_until(buf, i, term):
+    """读 buf[i:] 到 term 之前的整数（term 为 b"e" 时是整数值，b":" 时是字符串长度），返回 (值, term 的位置)"""
+    j = buf.find(term, i)
+    if j < 0:
+        raise BencodeError(f"unterminated value at offset {i}")
+    if not _NUMBER_SYNTAX[term].fullmatch(buf, i, j):
+        raise BencodeError(f"bad integer at offset {i}")
+    return int(buf[i:j]), j
+
+
+def skip_value(buf, i):
+    """
+    返回从 i 开始的值的结束位置，不做解码。
+    字符串按长度前缀直接跳过，开销只和结构里的元素个数有关，和字节数无关。
+    """
+    c = buf[i]
+    if c == _I:
+        return _read_until(buf, i + 1, b"e")[1] + 1
+    if c == _L or c == _D:
+        i += 1
+        while buf[i] != _E:
+            i = skip_value(buf, i)
+        return i + 1
+    if c in _DIGITS:
+        n, j = _read_until(buf, i, b":")
+        j += 1
+        if j + n > len(buf):
+            raise BencodeError(f"truncated data: string at offset {i} needs {n} bytes")
+        return j + n
+    raise BencodeError(f"unexpected byte {bytes([c])!r} at offset {i}")
+
+
+def decode_at(buf, i):
+    """完整解码从 i 开始的值，返回 (值, 结束位置)；只有到这里才会复制字节串"""
+    c = buf[i]
+    if c in _DIGITS:
+        n, j = _read_until(buf, i, b":")
+        j += 1
+        if j + n > len(buf):
+            raise BencodeError(f"truncated data: string at offset {i} needs {n} bytes")
+        return bytes(buf[j:j + n]), j + n
+    if c == _D:
+        out = {}
+        i += 1
+        while buf[i] != _E:
+            k, i = decode_at(buf, i)
+            out[k], i = decode_at(buf, i)
+        return out, i + 1
+    if c == _L:
+        out = []
+        i += 1
+        while buf[i] != _E:
+            v, i = decode_at(buf, i)
+            out.append(v)
+        return out, i + 1
+    if c == _I:
+        v, j = _read_until(buf, i + 1, b"e")
+        return v, j + 1
+    raise BencodeError(f"unexpected byte {bytes([c])!r} at offset {i}")
+
+
+def decode(data):
+    """解码整段数据；字典的 key 和字符串都保持为 bytes，与 bencodepy 一致"""
+    if not data:
+        raise BencodeError("empty data")
+    try:
+        value, end = decode_at(data, 0)
+    except IndexError:
+        raise BencodeError("truncated data") from None
+    except RecursionError:
+        raise BencodeError("nesting too deep") from None
+    if end != len(data):
+        raise BencodeError(f"trailing data at offset {end}")
+    return value
+
+
+def string_span(buf, i):
+    """字节串值在 buf 中的 [start, end)，不复制内容"""
+    n, j = _read_until(buf, i, b":")
+    if j + 1 + n > len(buf):
+        raise BencodeError(f"truncated data: string at offset {i} needs {n} bytes")
+    return j + 1, j + 1 + n
+
+
+def iter_dict(buf, i):
+    """逐个给出字典里的 (key, 值的起始位置)，值本身不解码"""
+    if buf[i] != _D:
+        raise BencodeError(f"not a dict at offset {i}")
+    i += 1
+    while buf[i] != _E:
+        n, j = _read_until(buf, i, b":")
+        v = j + 1 + n
+        if v > len(buf):
+            raise BencodeError(f"truncated data: key at offset {i} needs {n} bytes")
+        key = bytes(buf[j + 1:v])
+        yield key, v
+        i = skip_value(buf, v)
+
+
+def lookup(buf, path, sep="."):
+    """
+    按路径定位值的起始位置，如 "info.piece length"、"info.files.0.path"；
+    字典按 key 匹配，列表按下标，沿途跳过的值都不解码。
+    """
+    i = 0
+    if not path:
+        return i
+    for part in path.split(sep):
+        c = buf[i]
+        if c == _D:
+            want = part.encode("utf-8")
+            for key, v in iter_dict(buf, i):
+                if key == want:
+                    i = v
+                    break
+            else:
+                raise KeyError(part)
+        elif c == _L:
+            try:
+                idx = int(part)
+            except ValueError:
+                raise KeyError(part) from None
+            i += 1
+            for _ in range(idx):
+                if buf[i] == _E:
+                    raise KeyError(part)
+                i = skip_value(buf, i)
+            if buf[i] == _E:
+                raise KeyError(part)
+        else:
+            raise KeyError(part)
+    return i
+
+
+def open_buffer(path):
+    """mmap 整个文件，按需访问；空文件无法 mmap，直接返回 bytes"""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+#
+# 编码
+#
+
+def _encode(value, put):
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        put(b"%d:" % len(value))
+        put(bytes(value))
+    elif isinstance(value, str):
+        raw = value.encode("utf-8")
+        put(b"%d:" % len(raw))
+        put(raw)
+    elif isinstance(value, bool):
+        put(b"i%de" % int(value))
+    elif isinstance(value, int):
+        put(b"i%de" % value)
+    elif isinstance(value, dict):
+        put(b"d")
+        items = [(k.encode("utf-8") if isinstance(k, str) else bytes(k), v) for k, v in value.items()]
+        items.sort(key=lambda kv: kv[0])
+        for k, v in items:
+            put(b"%d:" % len(k))
+            put(k)
+            _encode(v, put)
+        put(b"e")
+    elif isinstance(value, (list, tuple)):
+        put(b"l")
+        for v in value:
+            _encode(v, put)
+        put(b"e")
+    else:
+        raise BencodeError(f"cannot encode {type(value).__name__}")
+
+
+def encode(value):
+    """编码为 bencode；字典按 key 的字节序排序，str 按 utf-8 编码"""
+    out = []
+    _encode(value, out.append)
+    return b"".join(out)
+
+
+#
+# piece 位图
+#
+
+PACKED_THRESHOLD = 1 << 20  # piece 数达到这个量级时默认按位存储
+
+_RE_SET = re.compile(rb"[^\x00]+")
+_RE_CLEAR = re.compile(rb"\x00+")
+# 一个字节展开成 8 个 0/1 字节，高位在前
+_EXPAND = [bytes((b >> (7 - k)) & 1 for k in range(8)) for b in range(256)]
+_TO_ONE = bytes([0] + [1] * 255)
+
+
+class Bitfield:
+    """
+    piece 位图。
+    packed=False：每块一个字节（0=没有，非 0=有），与 fastresume 的 pieces 格式一致，查找 run 最快；
+    packed=True：每块一位（高位在前，同 BEP 3 的 bitfield），百万级 piece 的种子内存省 8 倍。
+    两种模式接口一致。
+    """
+
+    __slots__ = ("size", "packed", "_data")
+
+    def __init__(self, size, packed=False):
+        self.size = size
+        self.packed = packed
+        self._data = bytearray((size + 7) // 8 if packed else size)
+
+    @classmethod
+    def from_pieces(cls, pieces, packed=None):
+        """由 fastresume 的 pieces（每块一字节）构造；packed=None 时按 piece 数自动选择"""
+        if packed is None:
+            packed = len(pieces) >= PACKED_THRESHOLD
+        bf = cls(len(pieces), packed)
+        if not packed:
+            bf._data[:] = pieces
+        else:
+            for first, last in _iter_runs(_RE_SET, pieces):
+                bf.set_range(first, last)
+        return bf
+
+    def to_pieces(self):
+        """转回 fastresume 的 pieces 格式：每块一字节，有为 1"""
+        if not self.packed:
+            return bytes(self._data).translate(_TO_ONE)
+        return b"".join(_EXPAND[b] for b in self._data)[:self.size]
+
+    def __len__(self):
+        return self.size
+
+    def test(self, i):
+        if not 0 <= i < self.size:
+            raise IndexError(i)
+        if self.packed:
+            return bool(self._data[i >> 3] & (0x80 >> (i & 7)))
+        return bool(self._data[i])
+
+    __getitem__ = test
+
+    def set(self, i, value=True):
+        self.set_range(i, i + 1, value)
+
+    def set_range(self, first, last, value=True):
+        """把 [first, last) 设为 value"""
+        first = max(first, 0)
+        last = min(last, self.size)
+        if first >= last:
+            return
+        data = self._data
+        if not self.packed:
+            data[first:last] = (b"\x01" if value else b"\x00") * (last - first)
+            return
+
+        # 头尾不满一个字节的部分逐位处理，中间整字节一次性赋值
+        fb = (first + 7) >> 3
+        lb = last >> 3
+        if fb > lb:
+            mask = ((0xFF >> (first & 7)) & (0xFF << (8 - (last & 7)))) & 0xFF
+            data[lb] = data[lb] | mask if value else data[lb] & ~mask
+            return
+        if first & 7:
+            mask = 0xFF >> (first & 7)
+            data[fb - 1] = data[fb - 1] | mask if value else data[fb - 1] & ~mask & 0xFF
+        if lb > fb:
+            data[fb:lb] = (b"\xff" if value else b"\x00") * (lb - fb)
+        if last & 7:
+            mask = (0xFF << (8 - (last & 7))) & 0xFF
+            data[lb] = data[lb] | mask if value else data[lb] & ~mask & 0xFF
+
+    def count(self, first=0, last=None):
+        """[first, last) 中已有的块数（popcount）"""
+        last = self.size if last is None else min(last, self.size)
+        if first >= last:
+            return 0
+        if not self.packed:
+            return (last - first) - self._data.count(0, first, last)
+        fb, lb = first >> 3, (last + 7) >> 3
+        n = int.from_bytes(self._data[fb:lb], "big")
+        # 去掉区间外的位
+        n >>= (lb << 3) - last
+        n &= (1 << (last - first)) - 1
+        return n.bit_count()
+
+    def runs(self, value=True):
+        """连续为 value 的块区间 [first, last)"""
+        if not self.packed:
+            yield from _iter_runs(_RE_SET if value else _RE_CLEAR, self._data)
+            return
+        # 查表展开成每块一字节再交给正则，Python 层只有 size / 8 次操作
+        expanded = b"".join(_EXPAND[b] for b in self._data)[:self.size]
+        yield from _iter_runs(_RE_SET if value else _RE_CLEAR, expanded)
+
+    def all(self):
+        return self.count() == self.size
+
+
+def _iter_runs(pattern, data):
+    for m in pattern.finditer(data):
+        yield m.start(), m.end()
+
+
+#
+# 与 bencodepy 对比
+#
+
+def bench(paths, rounds=20):
+    try:
+        import bencodepy
+    except ImportError:
+        bencodepy = None
+        print("bencodepy not installed, only timing bcodec")
+
+    for path in paths:
+        with open(path, "rb") as f:
+            raw = f.read()
+        row = [f"{os.path.basename(path)} ({len(raw)} bytes)"]
+        candidates = [("bcodec", decode, encode)]
+        if bencodepy:
+            candidates.append(("bencodepy", bencodepy.decode, bencodepy.encode))
+        for name, dec, enc in candidates:
+            t0 = time.perf_counter()
+            for _ in range(rounds):
+                value = dec(raw)
+            t1 = time.perf_counter()
+            for _ in range(rounds):
+                enc(value)
+            t2 = time.perf_counter()
+            row.append(f"{name}: decode {(t1 - t0) / rounds * 1e3:.3f}ms encode {(t2 - t1) / rounds * 1e3:.3f}ms")
+        if encode(decode(raw)) != raw:
+            row.append("(re-encode differs from input)")
+        print("  ".join(row))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] != "bench":
+        print("Usage: bcodec.py bench <file> [...]")
+        sys.exit(1)
+    bench(sys.argv[2:])
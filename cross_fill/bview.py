@@ -1,16 +1,23 @@
 #!/root/venv/bin/python
 """
-bview.py - 用 bencodepy 解码指定文件并漂亮打印（处理 bytes 显示）
+bview.py - 用 bcodec 解码指定文件并漂亮打印（处理 bytes 显示）
 用法:
     python3 bview.py path/to/file.fastresume
+    python3 bview.py path/to/file.torrent -p "info.piece length"   # 只取某个路径，不解码整个文件
+    python3 bview.py path/to/file.torrent -p info -k                # 列出某个字典的键
+    python3 bview.py path/to/BT_backup -o summary.jsonl             # 目录：批量输出每个种子一行 JSON
 """
+import os
 import sys
+import json
 import argparse
 import pprint
-import bencodepy
 import binascii
+from concurrent.futures import ProcessPoolExecutor
+from bcodec import BencodeError, decode, decode_at, iter_dict, lookup, open_buffer, skip_value, string_span
 
 TRUNC_HEX_LEN = 64 # 十六进制前缀长度（字符数，不是字节数）
+DEFAULT_BATCH_CACHE = os.path.expanduser("~/.cache/bview_batch.json")
 
 def bytes_preview(b: bytes) -> str:
     """尝试把 bytes 解为 utf-8 字符串，否则返回简短 hex/len 表示。"""
@@ -30,7 +37,7 @@ def bytes_preview(b: bytes) -> str:
 
 def normalize(value):
     """
-    将 bencodepy 解码得到的数据结构转换为更可读的 Python 结构：
+    将 bencode 解码得到的数据结构转换为更可读的 Python 结构：
     - bytes -> 尝试 utf-8 字符串，否则简短 hex 表示
     - dict keys (bytes) -> 尝试转为 str（utf-8），否则保留为 bytes_preview 表示
     """
@@ -58,12 +65,190 @@ def normalize(value):
     # 兜底
     return str(value)
 
+def _get(buf, path):
+    try:
+        return decode_at(buf, lookup(buf, path))[0]
+    except KeyError:
+        return None
+
+
+def summarize(directory, hash_hex, fields=()):
+    """
+    一个种子的摘要：名称、大小、piece 数、完成度、保存路径，以及 fields 指定的额外路径。
+    只按路径取需要的值，pieces 之类的大字符串只看长度不解码。
+    额外路径先在 .fastresume 里找，找不到再去 .torrent 里找。
+    """
+    record = {"hash": hash_hex}
+    tor = fast = b""
+    tor_path = os.path.join(directory, f"{hash_hex}.torrent")
+    fast_path = os.path.join(directory, f"{hash_hex}.fastresume")
+    if os.path.exists(tor_path):
+        tor = open_buffer(tor_path)
+    if os.path.exists(fast_path):
+        fast = open_buffer(fast_path)
+
+    piece_count = None
+    if tor:
+        name = _get(tor, "info.name")
+        record["name"] = normalize(name) if name is not None else None
+        length = _get(tor, "info.length")
+        if length is None:
+            # 多文件种子：只解码每个文件的 length
+            files = lookup(tor, "info.files")
+            length = 0
+            i = files + 1
+            while tor[i] != ord("e"):
+                for key, v in iter_dict(tor, i):
+                    if key == b"length":
+                        length += decode_at(tor, v)[0]
+                i = skip_value(tor, i)
+        record["size"] = length
+        record["piece_length"] = _get(tor, "info.piece length")
+        start, end = string_span(tor, lookup(tor, "info.pieces"))
+        piece_count = (end - start) // 20
+        record["piece_count"] = piece_count
+
+    if fast:
+        if "name" not in record:
+            name = _get(fast, "qBt-name")
+            record["name"] = normalize(name) if name is not None else None
+        save_path = _get(fast, "qBt-savePath") or _get(fast, "save_path")
+        record["save_path"] = normalize(save_path) if save_path is not None else None
+        try:
+            start, end = string_span(fast, lookup(fast, "pieces"))
+            have = (end - start) - fast[start:end].count(0)
+            total = piece_count or (end - start)
+            record["completed"] = round(have / total, 4) if total else None
+        except KeyError:
+            record["completed"] = None
+
+    for field in fields:
+        value = None
+        for buf in (fast, tor):
+            if buf:
+                value = _get(buf, field)
+                if value is not None:
+                    break
+        record[field] = normalize(value) if value is not None else None
+
+    return record
+
+
+def _summarize_safe(args):
+    directory, hash_hex, fields = args
+    try:
+        return hash_hex, summarize(directory, hash_hex, fields), None
+    except Exception as e:
+        return hash_hex, None, f"{type(e).__name__}: {e}"
+
+
+def batch(directory, out, fields=(), jobs=None, cache_path=DEFAULT_BATCH_CACHE):
+    """
+    目录批量模式：每个种子（按 hash 配对 .torrent/.fastresume）输出一行 JSON。
+    解析在进程池里并行；按文件 mtime 缓存结果，没变化的种子直接复用上次的记录。
+    """
+    fields = list(fields)
+    cache = {}
+    if cache_path and os.path.exists(cache_path):
+        try:
+            with open(cache_path, "r", encoding="utf-8") as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            cache = {}
+
+    mtimes = {}
+    for entry in os.scandir(directory):
+        base, ext = os.path.splitext(entry.name)
+        if ext in (".torrent", ".fastresume"):
+            mtimes.setdefault(base, {})[ext] = entry.stat().st_mtime_ns
+
+    records = {}
+    todo = []
+    for h in sorted(mtimes):
+        m = [mtimes[h].get(".torrent"), mtimes[h].get(".fastresume")]
+        cached = cache.get(h)
+        if cached and cached["mtime"] == m and cached["fields"] == fields:
+            records[h] = cached["record"]
+        else:
+            todo.append((directory, h, fields))
+
+    cached_count = len(records)
+    if todo:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            for h, record, err in pool.map(_summarize_safe, todo, chunksize=64):
+                if err:
+                    print(f"Failed to decode {h}: {err}", file=sys.stderr)
+                    continue
+                records[h] = record
+                m = [mtimes[h].get(".torrent"), mtimes[h].get(".fastresume")]
+                cache[h] = {"mtime": m, "fields": fields, "record": record}
+
+    for h in sorted(records):
+        out.write(json.dumps(records[h], ensure_ascii=False) + "\n")
+
+    print(f"{len(records)} torrents, {cached_count} from cache", file=sys.stderr)
+
+    if cache_path:
+        cache = {h: v for h, v in cache.items() if h in mtimes}
+        os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+        tmp = f"{cache_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(cache, f)
+        os.replace(tmp, cache_path)
+
+
 def main():
     parser = argparse.ArgumentParser(description="Decode bencoded file and pretty-print (handles bytes).")
-    parser.add_argument("file", help="path to bencoded file (torrent / fastresume / etc.)")
+    parser.add_argument("file", help="path to bencoded file (torrent / fastresume / etc.), or a BT_backup directory for batch mode")
+    parser.add_argument("-p", "--path", help='only show the value at this path, e.g. "info.piece length" (lazy, no full decode)')
+    parser.add_argument("-k", "--keys", action="store_true", help="list the keys of the dict at --path instead of its value")
+    parser.add_argument("--sep", default=".", help="path separator (default: %(default)s)")
+    parser.add_argument("-f", "--field", action="append", default=[],
+                        help="batch mode: extra path to include in each record (repeatable), e.g. qBt-category")
+    parser.add_argument("-o", "--output", help="batch mode: write JSON Lines here instead of stdout")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="batch mode: worker processes (default: CPU count)")
+    parser.add_argument("--cache", default=DEFAULT_BATCH_CACHE, help="batch mode: mtime cache file (default: %(default)s)")
+    parser.add_argument("--no-cache", action="store_true", help="batch mode: ignore and don't write the cache")
     args = parser.parse_args()
 
     path = args.file
+    if os.path.isdir(path):
+        cache_path = None if args.no_cache else args.cache
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as out:
+                batch(path, out, args.field, args.jobs, cache_path)
+        else:
+            batch(path, sys.stdout, args.field, args.jobs, cache_path)
+        return
+
+    if args.path is not None or args.keys:
+        try:
+            buf = open_buffer(path)
+        except Exception as e:
+            print(f"Failed to read file {path}: {e}", file=sys.stderr)
+            sys.exit(2)
+
+        try:
+            i = lookup(buf, args.path, args.sep)
+            if args.keys:
+                for key, _ in iter_dict(buf, i):
+                    print(normalize(key))
+                return
+            value, _ = decode_at(buf, i)
+        except KeyError as e:
+            print(f"Path not found: {args.path} (missing {e})", file=sys.stderr)
+            sys.exit(4)
+        except (BencodeError, IndexError) as e:
+            print(f"Failed to decode bencoded data: {e}", file=sys.stderr)
+            sys.exit(3)
+
+        norm = normalize(value)
+        if isinstance(norm, (dict, list)):
+            pprint.PrettyPrinter(indent=2, width=120, compact=False).pprint(norm)
+        else:
+            print(norm)
+        return
+
     try:
         with open(path, 'rb') as f:
             raw = f.read()
@@ -72,7 +257,7 @@ def main():
         sys.exit(2)
 
     try:
-        decoded = bencodepy.decode(raw)
+        decoded = decode(raw)
     except Exception as e:
         print(f"Failed to decode bencoded data: {e}", file=sys.stderr)
         sys.exit(3)
@@ -1,36 +1,860 @@
 #!/root/venv/bin/python
 import sys
 import os
-import bencodepy
+import errno
+import argparse
+import hashlib
+import json
+import heapq
+import time
+import threading
+import bcodec
+from bisect import bisect_right
 from pathlib import Path
+from collections import deque, OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 
 
-def load_fastresume(hash_hex):
-    p = f"{hash_hex}.fastresume"
+DEFAULT_EXTENT_SIZE = 16 << 20  # 单次顺序拷贝的最大字节数
+DEFAULT_MAX_OPEN_FILES = 256  # 同时打开的文件数上限，合集种子里可能有上千个文件
+DEFAULT_MIN_MATCH_SIZE = 1 << 20  # 扫描时小于这个大小的文件（nfo、字幕等）不参与分组
+DEFAULT_SCAN_CACHE = os.path.expanduser("~/.cache/cross_fill_scan.json")
+JOURNAL_BATCH = 256  # 日志攒够这么多条就落盘一次
+JOURNAL_INTERVAL = 5.0  # 或者距上次落盘超过这么多秒
+PROGRESS_INTERVAL = 1.0  # 进度输出的最小间隔（秒），非终端输出时放宽到 10 倍
+
+
+def load_fastresume(hash_hex, directory="."):
+    p = os.path.join(directory, f"{hash_hex}.fastresume")
     with open(p, "rb") as f:
-        d = bencodepy.decode(f.read())
+        d = bcodec.decode(f.read())
     return d, p
 
 
-def load_torrent(hash_hex):
-    p = f"{hash_hex}.torrent"
+def load_torrent(hash_hex, directory="."):
+    p = os.path.join(directory, f"{hash_hex}.torrent")
     with open(p, "rb") as f:
-        d = bencodepy.decode(f.read())
+        d = bcodec.decode(f.read())
     return d, p
 
 
+def save_fastresume(o):
+    """
+    把更新后的 pieces 写回 .fastresume。
+    先写同目录临时文件并 fsync，再 rename 覆盖，中途断电也不会留下半个文件。
+    """
+    fast = o["fast"]
+    fast[b"pieces"] = o["bitfield"].to_pieces()
+
+    # 已补完的 piece 不再是“下载了一半”
+    if isinstance(fast.get(b"unfinished"), list):
+        fast[b"unfinished"] = [u for u in fast[b"unfinished"] if not o["bitfield"].test(u[b"piece"])]
+
+    # libtorrent 1.x 会比对文件 mtime，不一致就强制重新校验，这里同步成当前值
+    file_sizes = fast.get(b"file_sizes")
+    if isinstance(file_sizes, list):
+        for f, entry in zip(o["files"], file_sizes):
+            if f["exists"] and not f["pad"] and entry and entry[0]:
+                entry[1] = int(os.stat(f["path"]).st_mtime)
+
+    path = o["fast_path"]
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(bcodec.encode(fast))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+    dir_fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
 def get_file_path(fast):
     return Path(fast[b"qBt-savePath"].decode()) / fast[b"qBt-name"].decode()
 
 
-def cross_fill(objs):
+def load_files(o):
+    """
+    种子内的文件列表，每个文件记录其在种子全局字节空间中的起始偏移。
+    单文件种子沿用 qBt-name 定位；多文件种子按 save_path/name/path，
+    在 qBittorrent 里改过名的文件以 mapped_files 为准。
+    """
+    info = o["torrent"][b"info"]
+    fast = o["fast"]
+
+    if b"files" not in info:
+        return [{
+            "path": get_file_path(fast),
+            "rel": (info[b"name"].decode(),),
+            "length": info[b"length"],
+            "offset": 0,
+            "pad": False,
+        }]
+
+    save_path = Path(fast[b"qBt-savePath"].decode())
+    root = info[b"name"].decode()
+    mapped = fast.get(b"mapped_files") or []
+
+    files = []
+    offset = 0
+    for k, f in enumerate(info[b"files"]):
+        rel = tuple(part.decode() for part in f[b"path"])
+        if k < len(mapped) and mapped[k]:
+            path = save_path / mapped[k].decode()
+        else:
+            path = save_path / root / Path(*rel)
+        files.append({
+            "path": path,
+            "rel": rel,
+            "length": f[b"length"],
+            "offset": offset,
+            # BEP 47 对齐用的填充文件，内容全是 0，不落盘
+            "pad": b"p" in f.get(b"attr", b""),
+        })
+        offset += f[b"length"]
+    return files
+
+
+def file_segments(o, start, end):
+    """把全局字节区间 [start, end) 拆成 (file, 文件内偏移, 长度)，用累计偏移二分定位起始文件"""
+    files = o["files"]
+    k = bisect_right(o["offsets"], start) - 1
+    while start < end:
+        f = files[k]
+        f_end = f["offset"] + f["length"]
+        if f_end > start:
+            n = min(end, f_end) - start
+            yield f, start - f["offset"], n
+            start += n
+        k += 1
+
+
+class FileCache:
+    """按路径缓存打开的 fd，超过上限时关闭最久未用的，避免上千文件的合集耗尽文件描述符"""
+
+    def __init__(self, max_open=DEFAULT_MAX_OPEN_FILES):
+        self.max_open = max_open
+        self._fds = OrderedDict()
+
+    def get(self, path, writable=False):
+        key = (path, writable)
+        fd = self._fds.get(key)
+        if fd is not None:
+            self._fds.move_to_end(key)
+            return fd
+
+        fd = os.open(path, os.O_RDWR if writable else os.O_RDONLY)
+        self._fds[key] = fd
+        while len(self._fds) > self.max_open:
+            _, old = self._fds.popitem(last=False)
+            os.close(old)
+        return fd
+
+    def fsync(self, path, data_only=False):
+        # fd 可能已被淘汰关闭，重新打开再 fsync 同样会把该文件的脏页刷盘
+        fd = self.get(path, writable=True)
+        if data_only:
+            os.fdatasync(fd)
+        else:
+            os.fsync(fd)
+
+    def close_all(self):
+        while self._fds:
+            _, fd = self._fds.popitem()
+            os.close(fd)
+
+
+class FillJournal:
+    """
+    补全进度的追加式日志，每行一条 JSON：某个种子的 piece 区间 [first, last) 已写入（并已校验）。
+    成批落盘：先 fdatasync 这一批写过的目标文件，再写日志并 fsync，
+    所以日志里出现的区间一定已经在盘上。中断时写了一半的段没有记录，
+    重启后仍是缺失状态，会被重新规划并整段覆盖。
+    """
+
+    def __init__(self, path, files, batch=JOURNAL_BATCH, interval=JOURNAL_INTERVAL):
+        self.path = path
+        self.files = files
+        self.batch = batch
+        self.interval = interval
+        self._pending = []
+        self._dirty_paths = set()
+        self._last_flush = time.monotonic()
+        self._f = None
+        self._lock = threading.Lock()
+
+    def replay(self, objs, verify=True):
+        """
+        读出已完成的区间并标记到各种子的 bitfield，返回恢复的 piece 数。
+        末尾写了一半的行直接截掉；校验模式下不信任未校验（--no-verify）写入的记录。
+        """
+        by_hash = {o["hash"]: o for o in objs}
+        restored = 0
+        valid_end = 0
+        if os.path.exists(self.path):
+            with open(self.path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        break
+                    valid_end += len(line)
+                    o = by_hash.get(rec["hash"])
+                    if o is None or (verify and not rec["verified"]):
+                        continue
+                    first, last = rec["first"], rec["last"]
+                    restored += last - first - o["bitfield"].count(first, last)
+                    o["bitfield"].set_range(first, last)
+                    o["dirty"] = True
+
+        self._f = open(self.path, "ab")
+        self._f.truncate(valid_end)
+        return restored
+
+    def add(self, o, first, last, verified, written=True):
+        with self._lock:
+            self._pending.append({"hash": o["hash"], "first": first, "last": last, "verified": verified})
+            if written:
+                start = first * o["piece_len"]
+                end = min(last * o["piece_len"], o["total_len"])
+                for f, _, _ in file_segments(o, start, end):
+                    if not f["pad"]:
+                        self._dirty_paths.add(f["path"])
+            if len(self._pending) >= self.batch or time.monotonic() - self._last_flush >= self.interval:
+                self._flush()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        for path in self._dirty_paths:
+            self.files.fsync(path, data_only=True)
+        self._f.write(b"".join(json.dumps(rec).encode() + b"\n" for rec in self._pending))
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        self._pending.clear()
+        self._dirty_paths.clear()
+        self._last_flush = time.monotonic()
+
+    def close(self, remove=False):
+        self.flush()
+        self._f.close()
+        if remove:
+            os.remove(self.path)
+
+
+def format_bytes(n):
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if abs(n) < 1024:
+            return f"{n:.1f}{unit}"
+        n /= 1024
+    return f"{n:.1f}TiB"
+
+
+class FillStats:
+    """
+    吞吐统计：读写字节数、按来源 / 目标的计数、规划 / IO / hash 各阶段耗时，
+    以及限频的进度输出。hash 在线程池里计时，所以计数都加锁。
+    """
+
+    def __init__(self, interval=PROGRESS_INTERVAL, stream=sys.stderr):
+        self.lock = threading.Lock()
+        self.stream = stream
+        self.tty = stream.isatty()
+        self.interval = interval if self.tty else interval * 10
+        self.started = time.monotonic()
+        self._last_report = self.started
+        self._last_bytes = 0
+
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.pieces_filled = 0
+        self.pieces_failed = 0
+        self.pieces_probed = 0
+        self.by_source = {}  # 种子 hash -> 从它读取的字节数
+        self.by_target = {}  # 种子 hash -> {"pieces", "bytes", "failed"}
+        self.timers = {"plan": 0.0, "read": 0.0, "write": 0.0, "copy": 0.0, "hash": 0.0, "hash_wait": 0.0}
+
+    @contextmanager
+    def timer(self, key):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            dt = time.perf_counter() - t0
+            with self.lock:
+                self.timers[key] += dt
+
+    def _target(self, h):
+        return self.by_target.setdefault(h, {"pieces": 0, "bytes": 0, "failed": 0})
+
+    def add_read(self, src_hash, n):
+        with self.lock:
+            self.bytes_read += n
+            self.by_source[src_hash] = self.by_source.get(src_hash, 0) + n
+
+    def add_written(self, target_hash, n):
+        with self.lock:
+            self.bytes_written += n
+            self._target(target_hash)["bytes"] += n
+
+    def add_pieces(self, target_hash, filled=0, failed=0, probed=0):
+        with self.lock:
+            self.pieces_filled += filled
+            self.pieces_failed += failed
+            self.pieces_probed += probed
+            t = self._target(target_hash)
+            t["pieces"] += filled
+            t["failed"] += failed
+        self.report()
+
+    def report(self, force=False):
+        """最多每 interval 秒输出一次进度：累计量和这段时间的读写速度"""
+        now = time.monotonic()
+        with self.lock:
+            if not force and now - self._last_report < self.interval:
+                return
+            moved = self.bytes_read + self.bytes_written
+            rate = (moved - self._last_bytes) / max(now - self._last_report, 1e-9)
+            self._last_report = now
+            self._last_bytes = moved
+            line = (f"[*] {now - self.started:7.1f}s  补全 {self.pieces_filled} piece  失败 {self.pieces_failed}  "
+                    f"读 {format_bytes(self.bytes_read)}  写 {format_bytes(self.bytes_written)}  "
+                    f"{format_bytes(rate)}/s")
+        if self.tty:
+            print(f"\r{line}\033[K", end="", file=self.stream, flush=True)
+        else:
+            print(line, file=self.stream, flush=True)
+
+    def to_dict(self):
+        with self.lock:
+            elapsed = time.monotonic() - self.started
+            return {
+                "elapsed": elapsed,
+                "bytes_read": self.bytes_read,
+                "bytes_written": self.bytes_written,
+                "read_rate": self.bytes_read / max(elapsed, 1e-9),
+                "write_rate": self.bytes_written / max(elapsed, 1e-9),
+                "pieces_filled": self.pieces_filled,
+                "pieces_failed": self.pieces_failed,
+                "pieces_probed": self.pieces_probed,
+                "timers": dict(self.timers),
+                "by_source": dict(self.by_source),
+                "by_target": {h: dict(v) for h, v in self.by_target.items()},
+            }
+
+    def summary(self):
+        self.report(force=True)
+        if self.tty:
+            print(file=self.stream)
+        d = self.to_dict()
+        t = d["timers"]
+        print(f"[*] 用时 {d['elapsed']:.1f}s：规划 {t['plan']:.1f}s，读 {t['read']:.1f}s，写 {t['write']:.1f}s，"
+              f"拷贝 {t['copy']:.1f}s，hash {t['hash']:.1f}s（线程累计，等待 {t['hash_wait']:.1f}s）")
+        print(f"[*] 平均读 {format_bytes(d['read_rate'])}/s，写 {format_bytes(d['write_rate'])}/s")
+        for h, n in sorted(d["by_source"].items(), key=lambda kv: -kv[1]):
+            print(f"    来源 {h}: {format_bytes(n)}")
+
+    def dump(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+def piece_runs_to_ranges(runs, piece_len, total_len):
+    """把 piece 区间 [first, last) 转换为字节区间 [start, end)"""
+    return [(first * piece_len, min(last * piece_len, total_len)) for first, last in runs]
+
+
+def have_ranges(o):
+    """已有数据的字节区间，按起点排序且互不相邻"""
+    return piece_runs_to_ranges(o["bitfield"].runs(True), o["piece_len"], o["total_len"])
+
+
+def missing_ranges(o):
+    """缺失数据的字节区间"""
+    return piece_runs_to_ranges(o["bitfield"].runs(False), o["piece_len"], o["total_len"])
+
+
+def intersect_ranges(a, b):
+    """两组有序区间求交，一次扫描完成"""
+    out = []
+    i = j = 0
+    while i < len(a) and j < len(b):
+        start = max(a[i][0], b[j][0])
+        end = min(a[i][1], b[j][1])
+        if start < end:
+            out.append((start, end))
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return out
+
+
+def merge_ranges(ranges):
+    """合并有序区间中重叠或相邻的部分"""
+    out = []
+    for start, end in ranges:
+        if out and start <= out[-1][1]:
+            out[-1] = (out[-1][0], max(out[-1][1], end))
+        else:
+            out.append((start, end))
+    return out
+
+
+def clip_ranges(ranges, lo, hi):
+    """有序区间里落在 [lo, hi) 内的部分，二分找到起点"""
+    out = []
+    k = bisect_right(ranges, lo, key=lambda r: r[1])
+    while k < len(ranges) and ranges[k][0] < hi:
+        out.append((max(ranges[k][0], lo), min(ranges[k][1], hi)))
+        k += 1
+    return out
+
+
+def subtract_ranges(a, b):
+    """有序区间 a 去掉 b 覆盖的部分"""
+    out = []
+    j = 0
+    for start, end in a:
+        while j < len(b) and b[j][1] <= start:
+            j += 1
+        k = j
+        while start < end and k < len(b) and b[k][0] < end:
+            if b[k][0] > start:
+                out.append((start, b[k][0]))
+            start = max(start, b[k][1])
+            k += 1
+        if start < end:
+            out.append((start, end))
+    return out
+
+
+def match_file(fa, B):
+    """在 B 中找和 A 的文件 fa 内容相同的文件：大小必须一致，路径越接近越优先"""
+    best = None
+    best_score = -1
+    for fb in B["by_length"].get(fa["length"], ()):
+        if fb["rel"] == fa["rel"]:
+            score = 2
+        elif fb["rel"][-1] == fa["rel"][-1]:
+            score = 1
+        else:
+            score = 0
+        if score > best_score:
+            best, best_score = fb, score
+    return best
+
+
+def source_coverage(A, B, suspect):
+    """
+    把 B 已有的数据映射到 A 的全局字节空间，返回有序的 [(start, end, src_file, base)]，
+    其中 A 的偏移 pos 对应源文件内偏移 pos - base；src_file 为 None 表示 A 自己的填充文件（全 0）。
+    suspect 记录各源文件里校验失败过的区间（文件内偏移），这些数据不再使用。
+    """
+    out = []
+    for fa in A["files"]:
+        if not fa["length"]:
+            continue
+        if fa["pad"]:
+            out.append((fa["offset"], fa["offset"] + fa["length"], None, fa["offset"]))
+            continue
+        fb = match_file(fa, B)
+        if fb is None:
+            continue
+        have = clip_ranges(B["ranges"], fb["offset"], fb["offset"] + fb["length"])
+        if fb["path"] in suspect:
+            bad = [(s + fb["offset"], e + fb["offset"]) for s, e in merge_ranges(sorted(suspect[fb["path"]]))]
+            have = subtract_ranges(have, bad)
+        shift = fa["offset"] - fb["offset"]
+        for start, end in have:
+            out.append((start + shift, end + shift, fb, fa["offset"]))
+    return out
+
+
+def combine_coverage(entries, doubt=None):
+    """
+    多个来源的覆盖合成一份不重叠的 coverage：每个位置都选能往后延伸最远的来源，
+    即贪心的区间覆盖，拼出同样的数据所需的读取次数最少。
+    doubt 记录各源文件里存疑的区间（文件内偏移），这些数据只在没有别的来源时才用。
+    """
+    if doubt:
+        clean = []
+        fallback = []
+        for start, end, src, base in entries:
+            if src is None or src["path"] not in doubt:
+                clean.append((start, end, src, base))
+                continue
+            bad = [(s + base, e + base) for s, e in merge_ranges(sorted(doubt[src["path"]]))]
+            clean.extend((s, e, src, base) for s, e in subtract_ranges([(start, end)], bad))
+            fallback.extend((s, e, src, base) for s, e in intersect_ranges([(start, end)], bad))
+        out = combine_coverage(clean)
+        covered = [(start, end) for start, end, _, _ in out]
+        for start, end, src, base in combine_coverage(fallback):
+            out.extend((s, e, src, base) for s, e in subtract_ranges([(start, end)], covered))
+        return sorted(out, key=lambda c: c[0])
+
+    entries = sorted(entries, key=lambda c: c[0])
+    out = []
+    heap = []
+    k = 0
+    pos = 0
+    while True:
+        while k < len(entries) and entries[k][0] <= pos:
+            heapq.heappush(heap, (-entries[k][1], k))
+            k += 1
+        while heap and -heap[0][0] <= pos:
+            heapq.heappop(heap)
+        if heap:
+            end = -heap[0][0]
+            _, _, src, base = entries[heap[0][1]]
+            out.append((pos, end, src, base))
+            pos = end
+        elif k < len(entries):
+            pos = entries[k][0]
+        else:
+            break
+    return out
+
+
+def coverage_slices(coverage, start, end):
+    """[start, end) 中每一小段的来源：(pos, 长度, src_file, 源文件内偏移)"""
+    k = bisect_right(coverage, start, key=lambda c: c[1])
+    while start < end:
+        c_start, c_end, src, base = coverage[k]
+        if c_start > start:
+            raise ValueError(f"offset {start} not covered by source")
+        n = min(c_end, end) - start
+        yield start, n, src, start - base
+        start += n
+        k += 1
+
+
+def plan_fill(A, coverage):
+    """
+    找出 A 缺失、且被 coverage 完整覆盖的 piece，返回 piece 区间 [(first, last), ...]。
+    代价只和两边 run 的数量有关，与 piece 数量无关。
+    """
+    plen = A["piece_len"]
+    total = A["total_len"]
+    avail = merge_ranges((start, end) for start, end, _, _ in coverage)
+    # 目标文件不存在（例如没勾选下载）的部分不补
+    missing = intersect_ranges(missing_ranges(A), A["present"])
+    out = []
+    for start, end in intersect_ranges(missing, avail):
+        # 只取完整落在交集里的 piece；最后一块 piece 在数据末尾截断
+        first = -(-start // plen)
+        last = A["piece_count"] if end >= total else end // plen
+        if first < last:
+            out.append((first, last))
+    return out
+
+
+def split_range(start, end, size):
+    """把 [start, end) 切成不超过 size 的小段"""
+    while start < end:
+        yield start, min(start + size, end)
+        start += size
+
+
+# copy_file_range 不支持的情况（跨文件系统 / 老内核 / 不支持的 fs），回退到 pread/pwrite
+_COPY_FALLBACK_ERRNOS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP}
+_use_copy_file_range = hasattr(os, "copy_file_range")
+
+
+def copy_range(src_fd, src_off, dst_fd, dst_off, length, buf):
+    """
+    把 src 的 [src_off, src_off + length) 拷贝到 dst 的 dst_off。
+    优先 copy_file_range 在内核内完成；否则用复用的 buf 做 preadv/pwrite。
+    """
+    global _use_copy_file_range
+
+    done = 0
+    if _use_copy_file_range:
+        try:
+            while done < length:
+                n = os.copy_file_range(src_fd, dst_fd, length - done, src_off + done, dst_off + done)
+                if n == 0:
+                    raise EOFError(f"unexpected EOF at offset {src_off + done}")
+                done += n
+            return
+        except OSError as e:
+            if e.errno not in _COPY_FALLBACK_ERRNOS:
+                raise
+            _use_copy_file_range = False
+
+    view = memoryview(buf)
+    while done < length:
+        n = os.preadv(src_fd, [view[:min(len(buf), length - done)]], src_off + done)
+        if n == 0:
+            raise EOFError(f"unexpected EOF at offset {src_off + done}")
+        write_all(dst_fd, view[:n], dst_off + done)
+        done += n
+
+
+def copy_extent(files, A, coverage, start, end, buf, stats):
+    """不经校验，把 A 的 [start, end) 从各来源文件直接拷到 A 对应的文件里"""
+    with stats.timer("copy"):
+        for pos, n, src, src_off in coverage_slices(coverage, start, end):
+            if src is None:
+                continue
+            src_fd = files.get(src["path"])
+            for f, off, m in file_segments(A, pos, pos + n):
+                if not f["pad"]:
+                    copy_range(src_fd, src_off, files.get(f["path"], writable=True), off, m, buf)
+                    stats.add_written(A["hash"], m)
+                src_off += m
+            stats.add_read(src["torrent"], n)
+
+
+def read_extent(files, coverage, view, start, stats):
+    """
+    按 coverage 把 A 的 [start, start + len(view)) 从各来源文件读进 view。
+    源文件比 fastresume 声称的短时，读不到的部分补 0（对应的 piece 自然校验不过），
+    返回这些读不到的源区间 [(path, start, end)]（文件内偏移）。
+    """
+    short = []
+    with stats.timer("read"):
+        for pos, n, src, src_off in coverage_slices(coverage, start, start + len(view)):
+            dst = view[pos - start:pos - start + n]
+            if src is None:
+                dst[:] = bytes(n)
+            else:
+                got = read_into(files.get(src["path"]), dst, src_off)
+                if got < n:
+                    dst[got:] = bytes(n - got)
+                    short.append((src["path"], src_off + got, src_off + n))
+                stats.add_read(src["torrent"], got)
+    return short
+
+
+def write_extent(files, A, view, start, stats):
+    """把 view 写到 A 的 [start, start + len(view))，可能跨多个文件"""
+    with stats.timer("write"):
+        pos = 0
+        for f, off, n in file_segments(A, start, start + len(view)):
+            if not f["pad"]:
+                write_all(files.get(f["path"], writable=True), view[pos:pos + n], off)
+                stats.add_written(A["hash"], n)
+            pos += n
+
+
+def read_into(fd, view, offset):
+    """把 fd 的 [offset, offset + len(view)) 读进 view，返回实际读到的字节数（遇到 EOF 时会少于 len(view)）"""
+    done = 0
+    while done < len(view):
+        n = os.preadv(fd, [view[done:]], offset + done)
+        if n == 0:
+            break
+        done += n
+    return done
+
+
+def write_all(fd, view, offset):
+    done = 0
+    while done < len(view):
+        done += os.pwrite(fd, view[done:], offset + done)
+
+
+def hash_pieces(view, piece_len, hashes, first, stats):
+    """逐块计算 SHA-1 并和种子里的 hash 比较；hashlib 会释放 GIL，可在线程池里并行"""
+    with stats.timer("hash"):
+        ok = []
+        for k, off in enumerate(range(0, len(view), piece_len)):
+            i = first + k
+            digest = hashlib.sha1(view[off:off + piece_len]).digest()
+            ok.append(digest == hashes[i * 20:(i + 1) * 20])
+        return ok
+
+
+def iter_true_runs(flags):
+    """flags 中连续为 True 的下标区间 [first, last)"""
+    first = None
+    for k, v in enumerate(flags):
+        if v and first is None:
+            first = k
+        elif not v and first is not None:
+            yield first, k
+            first = None
+    if first is not None:
+        yield first, len(flags)
+
+
+def blame_sources(A, coverage, piece, suspect, doubt):
+    """
+    A 的 piece 校验失败后追究用到的源数据，区间为源文件内偏移。
+    只来自一个种子时肯定是它的数据坏了，记入 suspect，之后不再使用；
+    多个种子拼成的 piece 不知道坏的是哪一份，先记入 doubt，下一轮优先换别的来源重拼，
+    用到的数据都已存疑过仍然失败时才全部记入 suspect。doubt 为 None 时一律记入 suspect。
+    """
+    start = piece * A["piece_len"]
+    end = min(start + A["piece_len"], A["total_len"])
+    used = [(src, src_off, src_off + n) for _, n, src, src_off in coverage_slices(coverage, start, end)
+            if src is not None]
+    if doubt is not None and len({src["torrent"] for src, _, _ in used}) > 1:
+        fresh = [(src, s, e) for src, s, e in used
+                 if subtract_ranges([(s, e)], merge_ranges(sorted(doubt.get(src["path"], ()))))]
+        if fresh:
+            for src, s, e in fresh:
+                doubt.setdefault(src["path"], []).append((s, e))
+            return
+    for src, s, e in used:
+        suspect.setdefault(src["path"], []).append((s, e))
+
+
+def fill_verified(files, A, coverage, runs, extent_size, pool, buffers, suspect, stats, write=True, journal=None,
+                  doubt=None):
+    """
+    读来源 -> 线程池校验 -> 写 A 的流水线：读下一段的同时，前面几段在别的线程里算 hash。
+    只有校验通过的 piece 才会写入 A。返回 (补全的 piece 区间, 校验失败的 piece 区间)；
+    校验失败的 piece 用到的源数据按 blame_sources 记入 suspect 或 doubt。
+    write=False 时只校验不写入，用于确认 A 自己磁盘上已有的数据。
+    """
+    plen = A["piece_len"]
+    per_extent = max(1, extent_size // plen)
+    jobs = deque()
+    good = []
+    bad = []
+
+    def commit(job):
+        first, view, fut = job
+        with stats.timer("hash_wait"):
+            ok = fut.result()
+        for k0, k1 in iter_true_runs(ok):
+            if write:
+                write_extent(files, A, view[k0 * plen:k1 * plen], (first + k0) * plen, stats)
+            if journal:
+                journal.add(A, first + k0, first + k1, verified=True, written=write)
+            good.append((first + k0, first + k1))
+        for k0, k1 in iter_true_runs([not v for v in ok]):
+            bad.append((first + k0, first + k1))
+            if suspect is None:
+                continue
+            for i in range(first + k0, first + k1):
+                blame_sources(A, coverage, i, suspect, doubt)
+
+    slot = 0
+    for run_first, run_last in runs:
+        for first, last in split_range(run_first, run_last, per_extent):
+            # 缓冲区循环复用：最老的一段处理完，它的缓冲区才会被再次使用
+            if len(jobs) == len(buffers):
+                commit(jobs.popleft())
+            start = first * plen
+            end = min(last * plen, A["total_len"])
+            view = memoryview(buffers[slot])[:end - start]
+            slot = (slot + 1) % len(buffers)
+
+            short = read_extent(files, coverage, view, start, stats)
+            if short and suspect is not None:
+                # 读不到的源数据不再使用，这一段里校验失败的 piece 下一轮换别的来源
+                for path, s_off, e_off in short:
+                    suspect.setdefault(path, []).append((s_off, e_off))
+            jobs.append((first, view, pool.submit(hash_pieces, view, plen, A["hashes"], first, stats)))
+
+    while jobs:
+        commit(jobs.popleft())
+
+    return good, bad
+
+
+def data_ranges(path, length):
+    """
+    用 SEEK_DATA/SEEK_HOLE 找出文件里真正分配了数据的区间（文件内偏移），空洞部分不用读。
+    不支持的文件系统会把整个文件当成一段数据返回。
+    """
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        out = []
+        pos = 0
+        while pos < length:
+            try:
+                start = os.lseek(fd, pos, os.SEEK_DATA)
+            except OSError as e:
+                if e.errno == errno.ENXIO:  # 后面全是空洞
+                    break
+                raise
+            end = min(os.lseek(fd, start, os.SEEK_HOLE), length)
+            if start >= end:
+                break
+            out.append((start, end))
+            pos = end
+        return out
+    finally:
+        os.close(fd)
+
+
+def disk_coverage(o):
+    """o 自己磁盘上有数据的部分，格式同 source_coverage，来源是 o 自己的文件"""
+    out = []
+    for f in o["files"]:
+        if not f["length"] or not f["exists"]:
+            continue
+        if f["pad"]:
+            out.append((f["offset"], f["offset"] + f["length"], None, f["offset"]))
+            continue
+        for start, end in data_ranges(f["path"], f["length"]):
+            out.append((f["offset"] + start, f["offset"] + end, f, f["offset"]))
+    return out
+
+
+def format_runs(runs):
+    return ", ".join(f"{a}" if b - a == 1 else f"{a}-{b - 1}" for a, b in runs)
+
+
+def run_sources(A, coverage, first, last):
+    """piece 区间 [first, last) 的数据来自哪些种子"""
+    start = first * A["piece_len"]
+    end = min(last * A["piece_len"], A["total_len"])
+    hashes = {src["torrent"] for _, _, src, _ in coverage_slices(coverage, start, end) if src is not None}
+    return ", ".join(sorted(hashes)) or "填充文件"
+
+
+def torrent_device(o):
+    """种子数据所在的设备号，用来按物理盘限制并发"""
+    for f in o["files"]:
+        if f["exists"] and f["length"] and not f["pad"]:
+            return os.stat(f["path"]).st_dev
+    return None
+
+
+def device_queues(tasks):
+    """按目标所在设备把任务分成队列"""
+    queues = {}
+    for task in tasks:
+        queues.setdefault(task["device"], deque()).append(task)
+    return list(queues.values())
+
+
+def run_per_device(queues, per_device, work):
+    """
+    每个设备的队列最多由 per_device 个线程消费，避免同一块盘上来回寻道；不同的盘之间并行。
+    work(queue) 在各线程里运行，自己从队列里取任务直到取空。
+    """
+    with ThreadPoolExecutor(max_workers=max(1, sum(min(per_device, len(q)) for q in queues))) as ex:
+        futs = [ex.submit(work, q) for q in queues for _ in range(min(per_device, len(q)))]
+        for fut in futs:
+            fut.result()
+
+
+def cross_fill(objs, extent_size=DEFAULT_EXTENT_SIZE, verify=True, hash_threads=None, write_resume=False,
+               max_open_files=DEFAULT_MAX_OPEN_FILES, probe_sparse=False, journal_path=None,
+               stats=None, verbose=False, per_device=1):
     #
     # 打开文件和元信息
     #
     for o in objs:
         info = o["torrent"][b"info"]
         o["piece_len"] = info[b"piece length"]
-        o["file_len"] = info[b"length"]
+        o["hashes"] = info[b"pieces"]
         
         pieces = None
         fast = o["fast"]
@@ -41,102 +865,439 @@ def cross_fill(objs):
         if not isinstance(pieces, (bytes, bytearray)):
             raise TypeError(f"unexpected pieces format in fastresume for {o['hash']}: {type(pieces)}")
 
-        # pieces 即为 bitfield：每 bit 一块，1=存在，0=不存在
-        # 但为了简单，我们按 bview 一样直接使用底层 bytes，并在内存中修改
-        o["bitfield"] = bytearray(pieces)
+        # pieces 即为 bitfield：每块一个字节，非 0=存在，0=不存在；
+        # 百万级 piece 的种子自动改用按位存储
+        o["bitfield"] = bcodec.Bitfield.from_pieces(pieces)
         o["piece_count"] = len(o["bitfield"])
 
-        o["file_path"] = get_file_path(o["fast"])
-        o["fp"] = open(o["file_path"], "r+b")
+        o["files"] = load_files(o)
+        for f in o["files"]:
+            f["torrent"] = o["hash"]
+        o["offsets"] = [f["offset"] for f in o["files"]]
+        o["total_len"] = sum(f["length"] for f in o["files"])
+        o["dirty"] = False
 
+        o["by_length"] = {}
+        for f in o["files"]:
+            f["exists"] = f["pad"] or os.path.isfile(f["path"])
+            if f["exists"] and f["length"] and not f["pad"]:
+                o["by_length"].setdefault(f["length"], []).append(f)
+        o["present"] = merge_ranges(
+            (f["offset"], f["offset"] + f["length"]) for f in o["files"] if f["exists"] or not f["length"]
+        )
 
-    # 按块大小从小到大排序，便于优先用小块补大块
-    objs.sort(key=lambda x: x["piece_len"])
 
+    files = FileCache(max_open_files)
+    stats = stats or FillStats()
 
-    for B in objs: # 作为补全源
+    # 从上次中断的地方继续：日志里记录的区间都已落盘且校验过
+    journal = None
+    if journal_path:
+        journal = FillJournal(journal_path, files)
+        restored = journal.replay(objs, verify=verify)
+        if restored:
+            print(f"[*] 从日志 {journal_path} 恢复 {restored} 个已补全的 piece")
+
+    for o in objs:
+        o["ranges"] = have_ranges(o)
+
+    hash_threads = hash_threads or os.cpu_count() or 1
+    pool = ThreadPoolExecutor(max_workers=hash_threads) if verify else None
+    suspect = {}
+    doubt = {}
+    for o in objs:
+        o["device"] = torrent_device(o)
+
+    def run_round(tasks):
+        """并行执行一轮任务：每个工作线程有自己的 fd 缓存和读缓冲区，hash 线程池是共享的"""
+        if not tasks:
+            return
+        queues = device_queues(tasks)
+        workers = sum(min(per_device, len(q)) for q in queues)
+        # 在途的段数 = 缓冲区个数：让每个 hash 线程都有活干，同时还有一段在读
+        ring = max(2, -(-(hash_threads + 1) // workers)) if verify else 1
+        # 校验时一段至少是一整个 piece：piece 比 extent_size 大时缓冲区按 piece 大小分配
+        buf_size = max([extent_size] + [task["o"]["piece_len"] for task in tasks]) if verify else extent_size
+
+        def work(queue):
+            wfiles = FileCache(max(8, max_open_files // workers))
+            buffers = [bytearray(buf_size) for _ in range(ring)]
+            try:
+                while queue:
+                    try:
+                        task = queue.popleft()
+                    except IndexError:
+                        break
+                    task["good"], task["bad"] = fill_target(task, wfiles, buffers)
+            finally:
+                wfiles.close_all()
+
+        run_per_device(queues, per_device, work)
+
+    def fill_target(task, wfiles, buffers):
+        A, coverage, runs = task["o"], task["coverage"], task["runs"]
+        if task["probe"]:
+            return fill_verified(wfiles, A, coverage, runs, extent_size, pool, buffers, None, stats,
+                                 write=False, journal=journal)
+        if verify:
+            return fill_verified(wfiles, A, coverage, runs, extent_size, pool, buffers, suspect, stats,
+                                 journal=journal, doubt=doubt)
+
+        # 不校验时走 copy_file_range：连续可补的 piece 合并成一段，按 extent_size 切块顺序拷贝
+        plen_a = A["piece_len"]
+        per_extent = max(1, extent_size // plen_a)
+        for run_first, run_last in runs:
+            for first, last in split_range(run_first, run_last, per_extent):
+                start = first * plen_a
+                end = min(last * plen_a, A["total_len"])
+                copy_extent(wfiles, A, coverage, start, end, buffers[0], stats)
+                if journal:
+                    journal.add(A, first, last, verified=False)
+        return runs, []
+
+    # fastresume 里的 pieces 经常是旧的：按磁盘上实际分配的数据找出候选 piece，校验通过的直接记为已有
+    if probe_sparse:
+        tasks = []
+        for o in objs:
+            with stats.timer("plan"):
+                coverage = disk_coverage(o)
+                runs = plan_fill(o, coverage)
+            if runs:
+                tasks.append({"o": o, "device": o["device"], "coverage": coverage, "runs": runs, "probe": True})
+        run_round(tasks)
+
+        for task in tasks:
+            o = task["o"]
+            for first, last in task["good"]:
+                o["bitfield"].set_range(first, last)
+            if task["good"]:
+                o["dirty"] = True
+                o["ranges"] = have_ranges(o)
+                found = sum(last - first for first, last in task["good"])
+                stats.add_pieces(o["hash"], probed=found)
+                print(f"[~] {o['hash']}: 磁盘上发现 {found} 个已有 piece")
+
+    # 不动点迭代：一个目标补上的数据可能让另一个目标的 piece 变得可补，直到某一轮什么都补不了为止。
+    # 每轮先按当前状态给所有目标做好计划，再按设备并行执行，结果在轮末统一合并。
+    rounds = 0
+    changed = True
+    while changed:
+        changed = False
+        rounds += 1
+
+        tasks = []
         for A in objs: # 作为被补全目标
-            if A is B:
-                continue
+            # 所有其他种子一起作为来源，一个 piece 可以由多个来源拼出来
+            with stats.timer("plan"):
+                entries = []
+                for B in objs:
+                    if B is not A:
+                        entries.extend(source_coverage(A, B, suspect))
+                coverage = combine_coverage(entries, doubt)
+                runs = plan_fill(A, coverage)
+            if runs:
+                tasks.append({"o": A, "device": A["device"], "coverage": coverage, "runs": runs, "probe": False})
+        if not tasks:
+            break
+        retries = sum(map(len, doubt.values()))
+        run_round(tasks)
+        # 多个来源拼成的 piece 校验失败后有了新的存疑数据：下一轮换来源重拼
+        if sum(map(len, doubt.values())) > retries:
+            changed = True
 
-            plen_a = A["piece_len"]
-            plen_b = B["piece_len"]
+        for task in tasks:
+            A, good, bad = task["o"], task["good"], task["bad"]
+            if bad:
+                stats.add_pieces(A["hash"], failed=sum(last - first for first, last in bad))
+                print(f"[!] {A['hash']}: piece {format_runs(bad)} 校验失败，已跳过")
 
-            bf_a = A["bitfield"]
-            bf_b = B["bitfield"]
+            # 标记 A 的 bitfield（已补完这些 piece，仅在内存中）
+            for first, last in good:
+                A["bitfield"].set_range(first, last)
+                if verbose:
+                    print(f"[+] {A['hash']}: 补全 piece {format_runs([(first, last)])} <- "
+                          f"{run_sources(A, task['coverage'], first, last)}")
+            stats.add_pieces(A["hash"], filled=sum(last - first for first, last in good))
 
-            for i in range(A["piece_count"]):
-                if bf_a[i] == 1:
-                    continue
+            # A 的覆盖区间变了，后续作为补全源时要用新的
+            if good:
+                changed = True
+                A["dirty"] = True
+                A["ranges"] = have_ranges(A)
 
-                startA = i * plen_a
-                endA = min(startA + plen_a, A["file_len"])
+    stats.summary()
+    print(f"[*] 共迭代 {rounds} 轮")
 
-                # 检查 B 是否完整覆盖 A 的 piece
-                pos = startA
-                ok = True
+    if pool:
+        pool.shutdown()
+    if journal:
+        journal.flush()
+
+    for o in objs:
+        if write_resume and o["dirty"]:
+            # 数据先落盘，再让 fastresume 声明这些 piece 已存在
+            for f in o["files"]:
+                if f["exists"] and f["length"] and not f["pad"]:
+                    files.fsync(f["path"])
+            save_fastresume(o)
+            note = f"，已写回 {o['fast_path']}"
+        else:
+            note = ""
+        filled = stats.by_target.get(o["hash"], {}).get("pieces", 0)
+        print(f"[√] 完成种子：{o['hash']}（补全 {filled} 个 piece{note}）")
+
+    if journal:
+        # 写回 fastresume 后进度已经持久化在 fastresume 里，日志不再需要
+        journal.close(remove=write_resume)
+    files.close_all()
 
-                while pos < endA:
-                    j = pos // plen_b
-                    if j >= len(bf_b) or bf_b[j] == 0:
-                        ok = False
-                        break
-                    pos = (j + 1) * plen_b
 
-                if not ok:
+def scan_one(directory, hash_hex):
+    """
+    解析一对 .torrent/.fastresume，只保留分组需要的摘要（可 json 序列化，便于缓存）。
+    每个文件记录 [长度, 全局偏移, 首个完整 piece 的 hash]，文件起点不对齐 piece 时 hash 为 None。
+    """
+    fast, _ = load_fastresume(hash_hex, directory)
+    tor, _ = load_torrent(hash_hex, directory)
+    info = tor[b"info"]
+    plen = info[b"piece length"]
+    hashes = info[b"pieces"]
+    pieces = fast.get(b"pieces", b"")
+
+    if b"files" in info:
+        entries = [(f[b"length"], b"p" in f.get(b"attr", b"")) for f in info[b"files"]]
+    else:
+        entries = [(info[b"length"], False)]
+
+    files = []
+    offset = 0
+    for length, pad in entries:
+        if not pad and length:
+            first_hash = None
+            if offset % plen == 0 and length >= plen:
+                i = offset // plen
+                first_hash = hashes[i * 20:(i + 1) * 20].hex()
+            files.append([length, offset, first_hash])
+        offset += length
+
+    return {
+        "hash": hash_hex,
+        "name": info[b"name"].decode(errors="replace"),
+        "piece_len": plen,
+        "piece_count": len(hashes) // 20,
+        "have": len(pieces) - pieces.count(0),
+        "files": files,
+    }
+
+
+def _scan_one_safe(args):
+    directory, hash_hex = args
+    try:
+        return hash_hex, scan_one(directory, hash_hex), None
+    except Exception as e:
+        return hash_hex, None, f"{type(e).__name__}: {e}"
+
+
+def scan_backup(directory, cache_path=DEFAULT_SCAN_CACHE, workers=None):
+    """
+    扫描 BT_backup 目录下所有 .torrent/.fastresume，返回摘要列表。
+    解析放在进程池里做；按两个文件的 mtime 缓存结果，没变的种子不再解析。
+    """
+    cache = {}
+    if cache_path and os.path.exists(cache_path):
+        try:
+            with open(cache_path, "r", encoding="utf-8") as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            cache = {}
+
+    summaries = []
+    todo = []
+    mtimes = {}
+    for entry in os.scandir(directory):
+        if not entry.name.endswith(".torrent"):
+            continue
+        h = entry.name[:-len(".torrent")]
+        try:
+            m = [entry.stat().st_mtime_ns, os.stat(os.path.join(directory, f"{h}.fastresume")).st_mtime_ns]
+        except FileNotFoundError:
+            continue
+        mtimes[h] = m
+        cached = cache.get(h)
+        if cached and cached["mtime"] == m:
+            summaries.append(cached["summary"])
+        else:
+            todo.append((directory, h))
+
+    print(f"[*] 共 {len(mtimes)} 个种子，缓存命中 {len(summaries)}，需解析 {len(todo)}")
+
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for h, summary, err in pool.map(_scan_one_safe, todo, chunksize=32):
+                if err:
+                    print(f"[!] 解析 {h} 失败：{err}")
                     continue
+                cache[h] = {"mtime": mtimes[h], "summary": summary}
+                summaries.append(summary)
 
-                # 读取 B 的对应部分
-                buf = bytearray(endA - startA)
-                pos = startA
-                while pos < endA:
-                    j = pos // plen_b
-                    j_start = j * plen_b
-                    j_end = min(j_start + plen_b, B["file_len"])
+    if cache_path:
+        # 已删除的种子顺便从缓存里去掉
+        cache = {h: v for h, v in cache.items() if h in mtimes}
+        os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+        tmp = f"{cache_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(cache, f)
+        os.replace(tmp, cache_path)
 
-                    overlap_start = pos
-                    overlap_end = min(j_end, endA)
-                    sz = overlap_end - overlap_start
+    return summaries
 
-                    B["fp"].seek(overlap_start)
-                    buf[overlap_start - startA : overlap_start - startA + sz] = B["fp"].read(sz)
 
-                    pos = overlap_end
+def find_groups(summaries, min_size=DEFAULT_MIN_MATCH_SIZE):
+    """
+    按文件长度建立索引，把含有相同文件的种子并成一组（并查集）。
+    同一长度下，如果 piece 大小相同的文件首块 hash 不同，说明内容并不一样，
+    这时只按 (piece 大小, 首块 hash) 细分合并，对不齐 piece 的文件无法判断，不参与合并。
+    只返回至少两个种子、且其中有未完成种子的组。
+    """
+    parent = list(range(len(summaries)))
 
-                # 写入 A
-                A["fp"].seek(startA)
-                A["fp"].write(buf)
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
 
-                # 标记 A 的 bitfield（已补完该 piece，仅在内存中）
+    def union(a, b):
+        parent[find(a)] = find(b)
 
-                A["bitfield"][i] = 1
+    by_length = {}
+    for idx, sm in enumerate(summaries):
+        for length, _, first_hash in sm["files"]:
+            if length >= min_size:
+                by_length.setdefault(length, []).append((idx, sm["piece_len"], first_hash))
 
+    for entries in by_length.values():
+        if len(entries) < 2:
+            continue
+        clusters = {}
+        for idx, plen, first_hash in entries:
+            if first_hash is not None:
+                clusters.setdefault((plen, first_hash), []).append(idx)
 
-                print(f"[+] {A['hash']}: 补全 piece {i} <- {B['hash']}")
+        plens = [plen for plen, _ in clusters]
+        if len(plens) == len(set(plens)):
+            # 没有冲突：同长度的都视为同一内容
+            merge = [[idx for idx, _, _ in entries]]
+        else:
+            merge = clusters.values()
 
-    for o in objs:
-        o["fp"].close()
-        print(f"[√] 完成文件：{o['file_path']}")
+        for members in merge:
+            for idx in members[1:]:
+                union(members[0], idx)
+
+    groups = {}
+    for idx in range(len(summaries)):
+        groups.setdefault(find(idx), []).append(summaries[idx])
+
+    return [
+        g for g in groups.values()
+        if len(g) >= 2 and any(sm["have"] < sm["piece_count"] for sm in g)
+    ]
+
+
+def parse_size(text):
+    """解析 16M / 512K / 1G 这样的大小"""
+    units = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+    text = text.strip().upper().rstrip("B").rstrip("I")
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
 
 
 def main():
-    if len(sys.argv) < 3:
-        print("Usage: cross_fill.py <hash1> <hash2> [...]")
-        sys.exit(1)
-
-    objs = []
-    for h in sys.argv[1:]:
-        fast, fp_fast = load_fastresume(h)
-        tor, fp_tor = load_torrent(h)
-
-        objs.append({
-            "hash": h,
-            "fast": fast,
-            "torrent": tor,
-        })
+    parser = argparse.ArgumentParser(description="让多个下载不完全的种子相互补全文件块")
+    parser.add_argument("hashes", nargs="*", help="参与补全的种子 hash（当前目录下的 .torrent/.fastresume）")
+    parser.add_argument("--scan", metavar="BT_BACKUP",
+                        help="扫描 qBittorrent 的 BT_backup 目录，自动找出内容相同的种子组")
+    parser.add_argument("--execute", action="store_true", help="配合 --scan：对找到的每一组执行补全")
+    parser.add_argument("--scan-cache", default=DEFAULT_SCAN_CACHE, help="扫描结果缓存文件（默认 %(default)s）")
+    parser.add_argument("--scan-workers", type=int, default=None, help="解析种子的进程数（默认 CPU 核数）")
+    parser.add_argument("--min-match-size", type=parse_size, default=DEFAULT_MIN_MATCH_SIZE,
+                        help="小于该大小的文件不参与分组（默认 %(default)s 字节）")
+    parser.add_argument("--no-verify", action="store_true",
+                        help="不按种子 piece hash 校验，直接 copy_file_range 拷贝（更快，但坏源会污染目标）")
+    parser.add_argument("--hash-threads", type=int, default=None,
+                        help="计算 SHA-1 的线程数（默认 CPU 核数）")
+    parser.add_argument("--write-resume", action="store_true",
+                        help="把校验通过的 piece 写回 .fastresume，免去 qBittorrent 全量重新检查（需先退出 qBittorrent）")
+    parser.add_argument("--probe-sparse", action="store_true",
+                        help="用 SEEK_DATA/SEEK_HOLE 检查磁盘上实际已有的数据，校验通过的 piece 也算作已有")
+    parser.add_argument("--journal", metavar="PATH",
+                        help="进度日志文件：中断后用同样的参数重跑，会跳过已完成的部分")
+    parser.add_argument("--stats-json", metavar="PATH", help="结束时把吞吐统计写成 JSON，便于调整参数")
+    parser.add_argument("-v", "--verbose", action="store_true", help="逐段打印补全的 piece")
+    parser.add_argument("--per-device", type=int, default=1,
+                        help="每块物理盘上同时补全的目标数，不同盘上的目标并行（默认 %(default)s）")
+    parser.add_argument("--max-open-files", type=int, default=DEFAULT_MAX_OPEN_FILES,
+                        help="同时打开的文件数上限（默认 %(default)s）")
+    parser.add_argument("--extent-size", type=parse_size, default=DEFAULT_EXTENT_SIZE,
+                        help="单次拷贝的最大块大小，如 16M（默认 %(default)s 字节）")
+    args = parser.parse_args()
+    if args.scan is None and len(args.hashes) < (1 if args.probe_sparse else 2):
+        parser.error("至少需要两个种子")
+    if args.write_resume and args.no_verify:
+        parser.error("--write-resume 只写回校验通过的 piece，不能和 --no-verify 一起用")
+    if args.probe_sparse and args.no_verify:
+        parser.error("--probe-sparse 靠 piece hash 确认数据，不能和 --no-verify 一起用")
+    if args.per_device < 1:
+        parser.error("--per-device 至少为 1")
+    if args.hash_threads is not None and args.hash_threads < 1:
+        parser.error("--hash-threads 至少为 1")
+    if args.max_open_files < 1:
+        parser.error("--max-open-files 至少为 1")
+
+    if args.scan is not None:
+        directory = args.scan
+        summaries = scan_backup(directory, cache_path=args.scan_cache, workers=args.scan_workers)
+        groups = find_groups(summaries, min_size=args.min_match_size)
+        print(f"[*] 找到 {len(groups)} 组可互相补全的种子")
+        for k, g in enumerate(groups, 1):
+            print(f"\n# 组 {k}")
+            for sm in g:
+                print(f"  {sm['hash']}  {sm['have']}/{sm['piece_count']}  {sm['name']}")
+        if not args.execute:
+            return
+        hash_groups = [[sm["hash"] for sm in g] for g in groups]
+    else:
+        directory = "."
+        hash_groups = [args.hashes]
+
+    stats = FillStats()
+    for hashes in hash_groups:
+        objs = []
+        for h in hashes:
+            fast, fp_fast = load_fastresume(h, directory)
+            tor, fp_tor = load_torrent(h, directory)
+
+            objs.append({
+                "hash": h,
+                "fast": fast,
+                "torrent": tor,
+                "fast_path": fp_fast,
+            })
+
+        cross_fill(objs, extent_size=args.extent_size, verify=not args.no_verify,
+                   hash_threads=args.hash_threads, write_resume=args.write_resume,
+                   max_open_files=args.max_open_files, probe_sparse=args.probe_sparse,
+                   journal_path=args.journal, stats=stats, verbose=args.verbose,
+                   per_device=args.per_device)
 
-    cross_fill(objs)
-    print("\n请回到 qBittorrent 对所有任务执行一次【重新检查】以更新位图\n")
+    if args.stats_json:
+        stats.dump(args.stats_json)
+    if args.write_resume:
+        print("\n已写回 fastresume，启动 qBittorrent 后即为新的进度，无需重新检查\n")
+    else:
+        print("\n请回到 qBittorrent 对所有任务执行一次【重新检查】以更新位图\n")
 
 
 if __name__ == "__main__":
@@ -1,64 +1,196 @@
 #!/usr/bin/env python3
 
-import subprocess
 import requests
 import datetime
+import argparse
+import errno
+import select
+import socket
+import struct
+import time
+import json
+import ipaddress
+import threading
+import queue
 import re
 import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 TOKEN = "hidden"
 ZONE_ID = "hidden"
+# 地址变化后需要通知的qBittorrent实例（Web API），配置文件里的 qbittorrent 优先
+QBITTORRENT_INSTANCES = [
+    {"url": "http://127.0.0.1:8080", "username": "hidden", "password": "hidden"},
+    {"url": "http://127.0.0.1:8081", "username": "hidden", "password": "hidden"},
+]
 
-# 获取IPv6地址
-def get_ipv6():
+IFACE = "eth0"
+IPV4_POLL_INTERVAL = 600  # 守护模式下公网IPv4的轮询间隔（秒），IPv6由内核事件触发
+EVENT_DEBOUNCE = 2.0  # 收到地址变化事件后等这么久再更新，合并同一批事件
+CONFIG_FILE = "/etc/ddns.json"  # 多zone、多记录的配置，不存在时使用上面写死的TOKEN/ZONE_ID
+DEFAULT_CONCURRENCY = 8  # 同时进行的Cloudflare请求数
+DEFAULT_RATE_LIMIT = 4.0  # 每秒请求数上限（Cloudflare 限制为 1200 次 / 5 分钟）
+DEFAULT_BURST = 30  # 允许的突发请求数，前缀变化时几十条记录可以一次发出
+HTTP_TIMEOUT = 10
+# 公网IPv4回显服务，同时查询，取最先返回的合法结果
+DEFAULT_IPV4_SOURCES = [
+    "https://4.ipw.cn",
+    "https://ipv4.icanhazip.com",
+    "https://api.ipify.org",
+    "https://api-ipv4.ip.sb/ip",
+    "http://myip.ipip.net",
+]
+IPV4_TIMEOUT = 5.0  # 获取IPv4的总时间上限（秒）
+STATE_FILE = "/var/lib/ddns/state.json"  # 上次发布到Cloudflare的记录（id和内容）
+STATE_MAX_AGE = 86400  # 状态超过这么久（秒）就重新拉一次记录列表，防止有人在网页上改过
+
+# rtnetlink 常量（linux/rtnetlink.h）
+RTMGRP_IPV4_IFADDR = 0x10
+RTMGRP_IPV6_IFADDR = 0x100
+RTM_NEWADDR = 20
+RTM_DELADDR = 21
+RT_SCOPE_UNIVERSE = 0
+
+# /proc/net/if_inet6 中的 scope 和 flags（linux/if_addr.h）
+IPV6_SCOPE_GLOBAL = 0x00
+IFA_F_TEMPORARY = 0x01
+IFA_F_DADFAILED = 0x08
+IFA_F_DEPRECATED = 0x20
+IFA_F_TENTATIVE = 0x40
+IPV6_SKIP_FLAGS = IFA_F_TEMPORARY | IFA_F_DADFAILED | IFA_F_DEPRECATED | IFA_F_TENTATIVE
+
+# 获取IPv6地址：直接读内核的地址表，不再调用 ifconfig
+# /proc/net/if_inet6 每行：地址(32位十六进制) 网卡序号 前缀长度 scope flags 网卡名
+def get_ipv6(iface=IFACE):
     try:
-        result = subprocess.run(['/usr/sbin/ifconfig', 'eth0'], stdout=subprocess.PIPE, text=True)
-        lines = result.stdout.splitlines()
-        for line in lines:
-            if 'inet6' in line and 'fe80' not in line:
-                ipv6 = line.split()[1]
+        with open("/proc/net/if_inet6") as f:
+            for line in f:
+                addr, _, _, scope, flags, name = line.split()
+                if name != iface or int(scope, 16) != IPV6_SCOPE_GLOBAL or int(flags, 16) & IPV6_SKIP_FLAGS:
+                    continue
+                ipv6 = ipaddress.IPv6Address(bytes.fromhex(addr))
+                # 跳过 ULA 等非公网地址
+                if not ipv6.is_global:
+                    continue
                 print(f"成功获取IPv6地址: {ipv6}")
-                return ipv6
+                return str(ipv6)
     except Exception as e:
         print(f"获取IPv6地址时出错: {e}")
         return None
+    print(f"{iface} 上没有可用的公网IPv6地址")
     return None
 
 
-# 获取IPv4地址
-def get_ipv4():
-    try:
-        response = requests.get("http://myip.ipip.net")
-        if response.status_code == 200:
-            # 使用正则表达式提取IPv4地址
-            match = re.search(r"当前 IP：(\d+\.\d+\.\d+\.\d+)", response.text)
-            if match:
-                ipv4 = match.group(1)
-                print(f"成功获取IPv4地址: {ipv4}")
-                return ipv4
-            else:
-                print("未找到IPv4地址")
-        else:
-            print(f"请求失败，状态码: {response.status_code}")
-    except Exception as e:
-        print(f"请求出错: {e}")
+# 从一个回显服务取IPv4地址，返回值必须是合法的公网IPv4。
+# requests 的 timeout 只限制单次socket操作，一点点吐字节的服务能一直拖下去，所以边读边检查 deadline
+def query_ipv4(url, timeout, deadline=None):
+    if deadline is None:
+        deadline = time.monotonic() + timeout
+    with requests.get(url, timeout=timeout, stream=True) as response:
+        response.raise_for_status()
+        body = b""
+        for chunk in response.iter_content(1024):
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"{timeout} 秒内没有读完响应")
+            body += chunk
+    text = body.decode(response.encoding or "utf-8", errors="replace")
+    for match in re.finditer(r"\d+\.\d+\.\d+\.\d+", text):
+        try:
+            ipv4 = ipaddress.IPv4Address(match.group(0))
+        except ValueError:
+            continue
+        if ipv4.is_global:
+            return str(ipv4)
+    raise ValueError("响应中没有公网IPv4地址")
+
+
+# 获取IPv4地址：同时问多个服务，先到的合法结果获胜（quorum=2 时需要两个服务一致），总耗时不超过 timeout
+def get_ipv4(sources=DEFAULT_IPV4_SOURCES, quorum=1, timeout=IPV4_TIMEOUT):
+    deadline = time.monotonic() + timeout
+    results = queue.Queue()
+
+    def worker(url):
+        try:
+            results.put((url, query_ipv4(url, timeout, deadline), None))
+        except Exception as e:
+            results.put((url, None, e))
+
+    # 用守护线程而不是线程池：到点就不等还没返回的慢服务，它们也不会拖住解释器退出
+    for url in sources:
+        threading.Thread(target=worker, args=(url,), daemon=True).start()
+
+    votes = {}
+    for _ in sources:
+        try:
+            url, ipv4, error = results.get(timeout=max(0.0, deadline - time.monotonic()))
+        except queue.Empty:
+            print(f"{timeout} 秒内未得到足够的IPv4结果")
+            break
+        if error is not None:
+            print(f"{url} 请求出错: {error}")
+            continue
+        votes[ipv4] = votes.get(ipv4, 0) + 1
+        if votes[ipv4] >= quorum:
+            print(f"成功获取IPv4地址: {ipv4}（{url}）")
+            return ipv4
+    if votes:
+        print(f"没有结果达到 {quorum} 个服务一致: {votes}")
+    else:
+        print("未找到IPv4地址")
     return None
 
+
+# Cloudflare API 限速：令牌桶，允许一小段突发，长期不超过 rate 次/秒
+class RateLimiter:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# 所有Cloudflare请求共用一个 keep-alive 连接池
+def make_session(config):
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=config['concurrency'])
+    session.mount("https://", adapter)
+    session.headers.update({
+        "Authorization": f"Bearer {config['token']}",
+        "Content-Type": "application/json"
+    })
+    session.limiter = RateLimiter(config['rate_limit'], config['burst'])
+    return session
+
+
+def api_request(session, method, url, **kwargs):
+    session.limiter.acquire()
+    return session.request(method, url, timeout=HTTP_TIMEOUT, **kwargs)
+
+
 # 查询现有的DNS记录并返回记录字典
-def get_existing_dns_records(zone_id):
+def get_existing_dns_records(session, zone_id):
     url = f"https://api.cloudflare.com/client/v4/zones/{zone_id}/dns_records"
-    headers = {
-        "Authorization": f"Bearer {TOKEN}",
-        "Content-Type": "application/json"
-    }
 
     try:
-        response = requests.get(url, headers=headers)
+        response = api_request(session, "GET", url, params={"per_page": 5000})
         if response.status_code == 200:
             records = response.json().get('result', [])
             # 使用 (name, type) 作为联合主键
             record_map = {(record['name'], record['type']): record for record in records}
-            print("成功获取现有DNS记录")
+            print(f"成功获取现有DNS记录（zone {zone_id}）")
             return record_map
         else:
             print(f"无法获取DNS记录列表，状态码: {response.status_code}, {response.text}")
@@ -68,52 +200,48 @@ def get_existing_dns_records(zone_id):
 
 
 # 更新DNS记录
-def update_dns_record(zone_id, record_id, name, record_type, content):
+def update_dns_record(session, zone_id, record_id, record, content):
     url = f"https://api.cloudflare.com/client/v4/zones/{zone_id}/dns_records/{record_id}"
-    headers = {
-        "Authorization": f"Bearer {TOKEN}",
-        "Content-Type": "application/json"
-    }
     data = {
         "content": content,
-        "name": name,
-        "proxied": False,
-        "type": record_type,
-        "ttl": 60
+        "name": record['name'],
+        "proxied": record['proxied'],
+        "type": record['type'],
+        "ttl": record['ttl']
     }
 
     try:
-        response = requests.put(url, json=data, headers=headers)
+        response = api_request(session, "PUT", url, json=data)
         if response.status_code == 200:
-            print(f"{record_type} 记录 {name} 更新成功")
+            print(f"{record['type']} 记录 {record['name']} 更新成功")
+            return response.json().get('result')
         else:
             print(f"更新失败: {response.status_code}, {response.text}")
     except Exception as e:
         print(f"请求出错: {e}")
+    return None
 
 # 创建新的DNS记录
-def create_dns_record(zone_id, name, record_type, content):
+def create_dns_record(session, zone_id, record, content):
     url = f"https://api.cloudflare.com/client/v4/zones/{zone_id}/dns_records"
-    headers = {
-        "Authorization": f"Bearer {TOKEN}",
-        "Content-Type": "application/json"
-    }
     data = {
-        "type": record_type,
-        "name": name,
+        "type": record['type'],
+        "name": record['name'],
         "content": content,
-        "ttl": 60,
-        "proxied": False
+        "ttl": record['ttl'],
+        "proxied": record['proxied']
     }
 
     try:
-        response = requests.post(url, json=data, headers=headers)
+        response = api_request(session, "POST", url, json=data)
         if response.status_code == 200:
-            print(f"成功创建新的 {record_type} 记录: {name}")
+            print(f"成功创建新的 {record['type']} 记录: {record['name']}")
+            return response.json().get('result')
         else:
             print(f"创建DNS记录失败，状态码: {response.status_code}, {response.text}")
     except Exception as e:
         print(f"创建DNS记录时出错: {e}")
+    return None
 
 
 # 记录DNS变化到日志文件
@@ -131,27 +259,78 @@ def log_dns_change(record_name, record_type, old_value, new_value):
 
 
 # 封装检查和更新DNS记录的逻辑
-def check_and_update_dns_record(zone_id, record_name, record_type, content, existing_records):
+def check_and_update_dns_record(session, zone_id, record, content, existing_records):
     # 使用 (record_name, record_type) 作为联合主键
+    record_name, record_type = record['name'], record['type']
     key = (record_name, record_type)
     if key in existing_records:
-        record = existing_records[key]
-        if record['content'] != content:  # 只在内容改变时更新
-            old_value = record['content']
-            print(f"{record_type}记录内容变化，旧值: {old_value}，新值: {content}")
+        current = existing_records[key]
+        if current['content'] != content:  # 只在内容改变时更新
+            old_value = current['content']
+            print(f"{record_type}记录 {record_name} 内容变化，旧值: {old_value}，新值: {content}")
             # 记录DNS变化到日志文件
             log_dns_change(record_name, record_type, old_value, content)
-            update_dns_record(zone_id, record['id'], record_name, record_type, content)
-            return True
+            result = update_dns_record(session, zone_id, current['id'], record, content)
+            store_result(existing_records, key, result)
+            return bool(result)
         else:
-            print(f"{record_type}记录内容未变化，无需更新")
+            print(f"{record_type}记录 {record_name} 内容未变化，无需更新")
             return False
     else:
         print(f"{record_type}记录 {record_name} 不存在，创建新记录")
         # 创建新记录时也记录到日志，原值为空
         log_dns_change(record_name, record_type, "无", content)
-        create_dns_record(zone_id, record_name, record_type, content)
-        return True
+        result = create_dns_record(session, zone_id, record, content)
+        store_result(existing_records, key, result)
+        return bool(result)
+
+
+# 把API返回的记录写回记录表；失败时删掉这一项，下次运行会因为缺失而重新同步
+def store_result(existing_records, key, result):
+    if result:
+        existing_records[key] = {'id': result['id'], 'content': result['content']}
+    else:
+        existing_records.pop(key, None)
+
+
+# 读取上次发布的状态，返回 {zone_id: (同步时间, 记录表)}；文件不存在或损坏都当作没有
+def load_state(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+        return {
+            zone_id: (zone['synced_at'],
+                      {(r['name'], r['type']): {'id': r['id'], 'content': r['content']}
+                       for r in zone['records']})
+            for zone_id, zone in state['zones'].items()
+        }
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"读取状态文件出错，将重新同步: {e}")
+        return {}
+
+
+# 原子地写入状态文件
+def save_state(path, state):
+    data = {'zones': {
+        zone_id: {
+            'synced_at': synced_at,
+            'records': [{'name': name, 'type': record_type, 'id': r['id'], 'content': r['content']}
+                        for (name, record_type), r in records.items()],
+        }
+        for zone_id, (synced_at, records) in state.items()
+    }}
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except Exception as e:
+        print(f"写入状态文件时出错: {e}")
 
 
 # 将DNS记录漂亮打印
@@ -162,32 +341,249 @@ def print_dns_records(record_map):
         print(f"{name:<30} {record_type:<10} {record['content']:<40}")
 
 
-def main():
-    import datetime; print(datetime.datetime.now())
-    ipv6 = get_ipv6()
-    ipv4 = get_ipv4()
-
-    # 查询现有DNS记录
-    existing_records = get_existing_dns_records(ZONE_ID)
-    if existing_records is None:
-        print("无法获取现有DNS记录，程序终止")
+# 读取配置；配置文件不存在时退回到脚本里写死的单条记录
+def load_config(path):
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            config = json.load(f)
+    else:
+        config = {
+            "token": TOKEN,
+            "zones": [{"zone_id": ZONE_ID, "records": [
+                {"name": "hidden.com", "type": "AAAA"},
+                {"name": "hidden.com", "type": "A"},
+            ]}],
+        }
+    config.setdefault("concurrency", DEFAULT_CONCURRENCY)
+    config.setdefault("rate_limit", DEFAULT_RATE_LIMIT)
+    config.setdefault("burst", DEFAULT_BURST)
+    config.setdefault("qbittorrent", QBITTORRENT_INSTANCES)
+    config.setdefault("ipv4_sources", DEFAULT_IPV4_SOURCES)
+    config.setdefault("ipv4_quorum", 1)
+    config.setdefault("ipv4_timeout", IPV4_TIMEOUT)
+    if not 1 <= config["ipv4_quorum"] <= len(config["ipv4_sources"]):
+        raise ValueError("ipv4_quorum 必须在 1 到 ipv4_sources 的个数之间")
+    for zone in config["zones"]:
+        for record in zone["records"]:
+            record.setdefault("ttl", 60)
+            record.setdefault("proxied", False)
+            if record["type"] not in ("A", "AAAA"):
+                raise ValueError(f"不支持的记录类型: {record['type']} ({record['name']})")
+            if "ipv6_suffix" in record and record["type"] != "AAAA":
+                raise ValueError(f"ipv6_suffix 只能用于AAAA记录 ({record['name']})")
+    return config
+
+
+# 记录要发布的内容；带 ipv6_suffix 的是局域网里的其他主机：本机前缀 + 该主机的主机号
+def record_content(record, ipv4, ipv6):
+    if record["type"] == "A":
+        return ipv4
+    if not ipv6:
+        return None
+    if "ipv6_suffix" not in record:
+        return ipv6
+    prefix_len = record.get("prefix_len", 64)
+    network = ipaddress.IPv6Network(f"{ipv6}/{prefix_len}", strict=False)
+    suffix = int(ipaddress.IPv6Address(record["ipv6_suffix"]))
+    host_mask = (1 << (128 - prefix_len)) - 1
+    return str(network.network_address + (suffix & host_mask))
+
+
+def update_once(config, session, iface=IFACE, do_ipv6=True, do_ipv4=True,
+                state_file=STATE_FILE, max_age=STATE_MAX_AGE):
+    print(datetime.datetime.now())
+    ipv6 = get_ipv6(iface) if do_ipv6 else None
+    ipv4 = get_ipv4(config["ipv4_sources"], config["ipv4_quorum"], config["ipv4_timeout"]) if do_ipv4 else None
+
+    # 本地状态足够新、且要发布的内容都和上次一样的zone，完全不需要访问Cloudflare
+    state = load_state(state_file)
+    now = time.time()
+    plans = []
+    for zone in config["zones"]:
+        wanted = {}
+        for record in zone["records"]:
+            content = record_content(record, ipv4, ipv6)
+            if content:
+                wanted[(record["name"], record["type"])] = (record, content)
+        if not wanted:
+            continue
+        synced_at, existing_records = state.get(zone["zone_id"], (None, {}))
+        fresh = synced_at is not None and now - synced_at < max_age
+        if fresh and all(key in existing_records and existing_records[key]['content'] == content
+                         for key, (_, content) in wanted.items()):
+            continue
+        plans.append({
+            "zone_id": zone["zone_id"],
+            "wanted": wanted,
+            "synced_at": synced_at,
+            "records": existing_records,
+            # 状态过期或缺少记录时，重新拉取记录列表；否则直接用状态里的记录id更新
+            "sync": not fresh or any(key not in existing_records for key in wanted),
+        })
+    if not plans:
+        print("地址与上次发布的一致，无需更新")
+        return False
+
+    # 各zone的记录列表和各条记录的更新都并发进行，总耗时接近一次往返
+    with ThreadPoolExecutor(max_workers=config["concurrency"]) as pool:
+        to_sync = [plan for plan in plans if plan["sync"]]
+        fetched = pool.map(lambda plan: get_existing_dns_records(session, plan["zone_id"]), to_sync)
+        for plan, records in zip(to_sync, list(fetched)):
+            if records is None:
+                print(f"无法获取 zone {plan['zone_id']} 的现有DNS记录，跳过")
+                plans.remove(plan)
+                continue
+            print_dns_records(records)
+            plan["records"] = records
+            plan["synced_at"] = now
+
+        futures = [
+            pool.submit(check_and_update_dns_record, session, plan["zone_id"], record, content, plan["records"])
+            for plan in plans
+            for record, content in plan["wanted"].values()
+        ]
+        updated = [future.result() for future in futures]
+
+    for plan in plans:
+        state[plan["zone_id"]] = (plan["synced_at"], plan["records"])
+    save_state(state_file, state)
+
+    if any(updated):
+        notify_qbittorrent(config["qbittorrent"], ipv4)
+    return any(updated)
+
+
+# 通过Web API让qBittorrent用新地址重新汇报，代替重启服务：
+# libtorrent 自己会监听网卡地址变化并重开监听端口，缺的只是立即向tracker汇报新地址
+def refresh_qbittorrent(instance, ipv4):
+    url = instance["url"].rstrip("/")
+    with requests.Session() as session:
+        if instance.get("username"):
+            response = session.post(f"{url}/api/v2/auth/login", timeout=HTTP_TIMEOUT, data={
+                "username": instance["username"],
+                "password": instance["password"],
+            })
+            if response.status_code != 200 or response.text != "Ok.":
+                raise ValueError(f"登录失败，状态码: {response.status_code}, {response.text}")
+        # 需要显式告诉tracker公网IPv4时（如端口映射在路由器上），同步更新 announce_ip
+        if instance.get("announce_ip") and ipv4:
+            session.post(f"{url}/api/v2/app/setPreferences", timeout=HTTP_TIMEOUT,
+                         data={"json": json.dumps({"announce_ip": ipv4})}).raise_for_status()
+        # 一次请求让所有种子重新汇报
+        session.post(f"{url}/api/v2/torrents/reannounce", timeout=HTTP_TIMEOUT,
+                     data={"hashes": "all"}).raise_for_status()
+
+
+def notify_qbittorrent(instances, ipv4):
+    if not instances:
         return
-    print_dns_records(existing_records)
-
-    updated = False
-    # 更新或创建IPv6记录
-    if ipv6:
-        updated |= check_and_update_dns_record(ZONE_ID, "hidden.com", "AAAA", ipv6, existing_records)
-        check_and_update_dns_record(ZONE_ID, "hidden.com", "AAAA", ipv6, existing_records)
-
-    # 更新或创建IPv4记录
-    if ipv4:
-        updated |= check_and_update_dns_record(ZONE_ID, "hidden.com", "A", ipv4, existing_records)
-        check_and_update_dns_record(ZONE_ID, "hidden.com", "A", ipv4, existing_records)
-
-    if updated:
-        os.system("systemctl restart qbittorrent-nox@qbtuser.service")
-        os.system("systemctl restart qbittorrent-nox@qptuser.service")
+    with ThreadPoolExecutor(max_workers=len(instances)) as pool:
+        futures = {pool.submit(refresh_qbittorrent, instance, ipv4): instance["url"] for instance in instances}
+        for future in as_completed(futures):
+            try:
+                future.result()
+                print(f"已通知 {futures[future]} 的所有种子重新汇报")
+            except Exception as e:
+                print(f"通知qBittorrent {futures[future]} 时出错: {e}")
+
+
+# 订阅内核的地址变化通知（rtnetlink），不需要轮询
+def open_addr_monitor():
+    sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE)
+    sock.bind((0, RTMGRP_IPV4_IFADDR | RTMGRP_IPV6_IFADDR))
+    return sock
+
+
+# 解析一批 netlink 消息，返回其中与指定网卡全局地址有关的协议族集合
+def parse_addr_events(data, ifindex):
+    families = set()
+    offset = 0
+    while offset + 16 <= len(data):
+        msg_len, msg_type, _, _, _ = struct.unpack_from("=LHHLL", data, offset)
+        if msg_len < 16:
+            break
+        if msg_type in (RTM_NEWADDR, RTM_DELADDR) and msg_len >= 24:
+            family, _, _, scope, index = struct.unpack_from("=BBBBI", data, offset + 16)
+            if index == ifindex and scope == RT_SCOPE_UNIVERSE:
+                families.add(family)
+        # 消息按 4 字节对齐
+        offset += (msg_len + 3) & ~3
+    return families
+
+
+# 读一批事件；接收缓冲区溢出（ENOBUFS）说明丢了事件，只能当作两个协议族都变了
+def read_addr_events(sock, ifindex):
+    try:
+        return parse_addr_events(sock.recv(65536), ifindex)
+    except OSError as e:
+        if e.errno != errno.ENOBUFS:
+            raise
+        print("netlink 事件溢出，执行一次完整检查")
+        return {socket.AF_INET, socket.AF_INET6}
+
+
+def run_daemon(config, session, iface, ipv4_interval, state_file, max_age):
+    ifindex = socket.if_nametoindex(iface)
+    sock = open_addr_monitor()
+    print(f"守护模式启动：监听 {iface} 的地址变化，每 {ipv4_interval} 秒检查一次公网IPv4并复查IPv6")
+
+    # 启动时先完整更新一次
+    try:
+        update_once(config, session, iface, state_file=state_file, max_age=max_age)
+    except Exception as e:
+        print(f"更新DNS时出错: {e}")
+    next_poll = time.monotonic() + ipv4_interval
+
+    while True:
+        timeout = max(0.0, next_poll - time.monotonic())
+        readable, _, _ = select.select([sock], [], [], timeout)
+
+        families = set()
+        if readable:
+            families |= read_addr_events(sock, ifindex)
+            if not families:
+                continue
+            # 地址变化往往是一批（删旧加新），稍等一下把同一批事件收完
+            deadline = time.monotonic() + EVENT_DEBOUNCE
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not select.select([sock], [], [], remaining)[0]:
+                    break
+                families |= read_addr_events(sock, ifindex)
+
+        # 定时检查时IPv6也复查一遍：上次更新AAAA失败后，前缀不变就不会再有地址事件来触发重试。
+        # 读 /proc/net/if_inet6 很便宜，地址没变时状态缓存会跳过Cloudflare
+        poll = time.monotonic() >= next_poll
+        if socket.AF_INET6 in families:
+            print(f"检测到 {iface} 的IPv6地址变化")
+        do_ipv6 = socket.AF_INET6 in families or poll
+        do_ipv4 = socket.AF_INET in families or poll
+        try:
+            update_once(config, session, iface, do_ipv6=do_ipv6, do_ipv4=do_ipv4, state_file=state_file, max_age=max_age)
+        except Exception as e:
+            print(f"更新DNS时出错: {e}")
+        if do_ipv4:
+            next_poll = time.monotonic() + ipv4_interval
+
+
+def main():
+    parser = argparse.ArgumentParser(description="获取本机公网IPv4/IPv6并更新Cloudflare DNS")
+    parser.add_argument("--daemon", action="store_true", help="常驻运行：IPv6变化由内核通知立即触发，IPv4定时检查（同时复查IPv6）")
+    parser.add_argument("--iface", default=IFACE, help="监听的网卡（默认 %(default)s）")
+    parser.add_argument("--ipv4-interval", type=int, default=IPV4_POLL_INTERVAL,
+                        help="守护模式下公网IPv4的检查间隔，秒，IPv6也按这个间隔复查（默认 %(default)s）")
+    parser.add_argument("-c", "--config", default=CONFIG_FILE, help="配置文件（默认 %(default)s）")
+    parser.add_argument("--state", default=STATE_FILE, help="上次发布状态的保存位置（默认 %(default)s）")
+    parser.add_argument("--max-age", type=int, default=STATE_MAX_AGE,
+                        help="状态超过这么久（秒）就重新向Cloudflare同步（默认 %(default)s）")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    session = make_session(config)
+    if args.daemon:
+        run_daemon(config, session, args.iface, args.ipv4_interval, args.state, args.max_age)
+    else:
+        update_once(config, session, args.iface, state_file=args.state, max_age=args.max_age)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
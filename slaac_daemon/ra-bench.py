@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""Replay harness and latency benchmark for slaac-daemon (pure stdlib).
+
+- Replays recorded `radvdump` text and raw RA captures (pcap) through the
+  daemon's own parsers and RA handling.
+- Netlink is replaced by a recorder that keeps an in-memory address table,
+  so nothing touches the real interfaces and no router is needed.
+- Reports parse throughput, prefix-change-to-address-applied latency and
+  how many netlink writes each RA caused (redundant applies).
+
+Without input files a synthetic RA stream is generated (--count, --change-every);
+--write-samples DIR saves it as radvdump text + pcap for later replays.
+
+Usage:
+    ra-bench.py [--radvdump FILE]... [--pcap FILE]... [--count N] [--change-every K]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import importlib.util
+import io
+import ipaddress
+import os
+import statistics
+import struct
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, Optional
+
+
+def load_daemon():
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "slaac-daemon.py")
+    spec = importlib.util.spec_from_file_location("slaac_daemon", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+sd = load_daemon()
+
+IFACE = "lo"  # exists everywhere; only its ifindex is used, the recorder never touches it
+ROUTER = "fe80::1"
+
+PCAP_MAGIC = 0xA1B2C3D4
+PCAP_MAGIC_NS = 0xA1B23C4D
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+ETH_P_IPV6 = 0x86DD
+IPPROTO_ICMPV6 = 58
+
+
+@dataclass
+class Record:
+    time_ns: int
+    msg_type: int
+    addr: Optional[str] = None
+    valid: int = 0
+    preferred: int = 0
+
+
+class RecordingNetlink:
+    """Stand-in for slaac-daemon's Netlink: records requests, answers address dumps."""
+
+    def __init__(self) -> None:
+        self.records: list[Record] = []
+        # addr -> (prefix_len, flags)
+        self.addresses: dict[str, tuple[int, int]] = {}
+
+    def close(self) -> None:
+        pass
+
+    def request(self, msg_type: int, flags: int, body: bytes) -> list[tuple[int, bytes]]:
+        now = time.perf_counter_ns()
+        if msg_type == sd.RTM_GETADDR:
+            self.records.append(Record(now, msg_type))
+            return [(sd.RTM_NEWADDR, self._addr_reply(addr, prefix_len, flags))
+                    for addr, (prefix_len, flags) in self.addresses.items()]
+
+        if msg_type == sd.RTM_NEWADDR:
+            _, prefix_len, _, _, _ = sd._IFADDRMSG.unpack_from(body)
+            addr, preferred, valid = None, 0, 0
+            for attr_type, data in sd.iter_attrs(body, sd._IFADDRMSG.size):
+                if attr_type == sd.IFA_ADDRESS:
+                    addr = str(ipaddress.IPv6Address(data))
+                elif attr_type == sd.IFA_CACHEINFO:
+                    preferred, valid = struct.unpack_from("=II", data)
+            self.addresses[addr] = (prefix_len, sd.IFA_F_DEPRECATED if preferred == 0 else 0)
+            self.records.append(Record(now, msg_type, addr, valid, preferred))
+            return []
+
+        self.records.append(Record(now, msg_type))
+        return []
+
+    @staticmethod
+    def _addr_reply(addr: str, prefix_len: int, flags: int) -> bytes:
+        body = sd._IFADDRMSG.pack(sd.socket.AF_INET6, prefix_len, flags, sd.RT_SCOPE_UNIVERSE,
+                                  sd.socket.if_nametoindex(IFACE))
+        return body + sd.nl_attr(sd.IFA_ADDRESS, ipaddress.IPv6Address(addr).packed)
+
+
+class FakeDaemon:
+    """What Interface needs from Daemon, without opening any socket."""
+
+    def __init__(self, nl: RecordingNetlink, grace: int) -> None:
+        self.nl = nl
+        self.grace = grace
+        self.secret = b"ra-bench"
+
+    def send_rs(self, iface: str) -> None:
+        pass
+
+
+#
+# Inputs
+#
+
+def synth_prefixes(count: int, change_every: int) -> list[str]:
+    return [str(ipaddress.IPv6Address(0x20010DB8 << 96 | (i // change_every) << 64)) for i in range(count)]
+
+
+def build_ra(prefix: str, valid: int = 7200, preferred: int = 3600, router_lifetime: int = 1800) -> bytes:
+    header = struct.pack("!BBHBBHII", sd.ICMP6_ROUTER_ADVERT, 0, 0, 64, 0, router_lifetime, 0, 0)
+    pio = struct.pack("!BB", sd.ND_OPT_PREFIX_INFORMATION, 4) + struct.pack(
+        "!BBIII16s", 64, 0xC0, valid, preferred, 0, ipaddress.IPv6Address(prefix).packed)
+    rdnss = struct.pack("!BBHI", sd.ND_OPT_RDNSS, 3, 0, 1800) + ipaddress.IPv6Address("2001:db8::53").packed
+    return header + pio + rdnss
+
+
+def render_radvdump(prefix: str, valid: int = 7200, preferred: int = 3600, router_lifetime: int = 1800) -> str:
+    return f"""#
+# radvd configuration generated by radvdump 2.19
+# based on Router Advertisement from {ROUTER}
+# received by interface {IFACE}
+#
+
+interface {IFACE}
+{{
+\tAdvSendAdvert on;
+\tAdvManagedFlag off;
+\tAdvOtherConfigFlag off;
+\tAdvDefaultLifetime {router_lifetime};
+\tAdvSourceLLAddress on;
+
+\tprefix {prefix}/64
+\t{{
+\t\tAdvValidLifetime {valid};
+\t\tAdvPreferredLifetime {preferred};
+\t\tAdvOnLink on;
+\t\tAdvAutonomous on;
+\t\tAdvRouterAddr off;
+\t}}; # End of prefix definition
+
+
+\tRDNSS 2001:db8::53
+\t{{
+\t\tAdvRDNSSLifetime 1800;
+\t}}; # End of RDNSS definition
+
+}}; # End of interface definition
+"""
+
+
+def write_pcap(path: str, packets: list[bytes]) -> None:
+    """Write ICMPv6 payloads as Ethernet/IPv6 frames (hop limit 255, source ROUTER)."""
+    with open(path, "wb") as f:
+        f.write(struct.pack("=IHHiIII", PCAP_MAGIC, 2, 4, 0, 0, 65535, LINKTYPE_ETHERNET))
+        src = ipaddress.IPv6Address(ROUTER).packed
+        dst = ipaddress.IPv6Address("ff02::1").packed
+        for i, icmp in enumerate(packets):
+            ip6 = struct.pack("!IHBB16s16s", 6 << 28, len(icmp), IPPROTO_ICMPV6, 255, src, dst)
+            frame = b"\x33\x33\x00\x00\x00\x01" + b"\x02\x00\x00\x00\x00\x01" + struct.pack("!H", ETH_P_IPV6) + ip6 + icmp
+            f.write(struct.pack("=IIII", i, 0, len(frame), len(frame)))
+            f.write(frame)
+
+
+def read_pcap(path: str) -> Iterator[tuple[str, bytes]]:
+    """Yield (source address, ICMPv6 RA payload) from a libpcap capture."""
+    with open(path, "rb") as f:
+        data = f.read()
+    magic = struct.unpack_from("<I", data)[0]
+    endian = "<" if magic in (PCAP_MAGIC, PCAP_MAGIC_NS) else ">"
+    if struct.unpack_from(endian + "I", data)[0] not in (PCAP_MAGIC, PCAP_MAGIC_NS):
+        raise ValueError(f"{path}: not a pcap file (pcapng is not supported)")
+    linktype = struct.unpack_from(endian + "I", data, 20)[0]
+    l2_len = {LINKTYPE_ETHERNET: 14, LINKTYPE_LINUX_SLL: 16, LINKTYPE_RAW: 0}.get(linktype)
+    if l2_len is None:
+        raise ValueError(f"{path}: unsupported link type {linktype}")
+
+    offset = 24
+    while offset + 16 <= len(data):
+        _, _, incl_len, _ = struct.unpack_from(endian + "IIII", data, offset)
+        frame = data[offset + 16:offset + 16 + incl_len]
+        offset += 16 + incl_len
+        ip6 = frame[l2_len:]
+        if len(ip6) < 40 or ip6[0] >> 4 != 6 or ip6[6] != IPPROTO_ICMPV6 or ip6[7] != 255:
+            continue  # no extension header support; RAs do not carry any
+        payload = ip6[40:40 + struct.unpack_from("!H", ip6, 4)[0]]
+        if payload and payload[0] == sd.ICMP6_ROUTER_ADVERT:
+            yield str(ipaddress.IPv6Address(ip6[8:24])), payload
+
+
+#
+# Benchmarks
+#
+
+def bench_parse_binary(packets: list[tuple[str, bytes]], rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for source, payload in packets:
+            sd.decode_ra(payload, source)
+    return len(packets) * rounds / (time.perf_counter() - start)
+
+
+def bench_parse_text(text: str, rounds: int) -> tuple[float, int]:
+    lines = text.splitlines(True)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        count = sum(1 for _ in sd.iter_radvdump(lines))
+    return count * rounds / (time.perf_counter() - start), count
+
+
+@dataclass
+class ReplayResult:
+    ras: int = 0
+    changes: int = 0
+    applies: int = 0
+    refreshes: int = 0
+    netlink_writes: int = 0
+    latencies_ns: list[int] = field(default_factory=list)
+    elapsed: float = 0.0
+
+
+async def replay(events: Iterable[tuple[int, Optional[sd.RouterAdvert]]], host_id: sd.HostId,
+                 grace: int) -> ReplayResult:
+    """events: (time the RA started to arrive, parsed RA), produced lazily so parsing counts toward latency."""
+    nl = RecordingNetlink()
+    interface = sd.Interface(FakeDaemon(nl, grace), IFACE, host_id)
+    result = ReplayResult()
+    last_prefix = None
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for arrived_ns, ra in events:
+            if ra is None:
+                continue
+            result.ras += 1
+            before = len(nl.records)
+            previous = interface.last_applied
+            interface.handle_ra(ra)
+
+            new = nl.records[before:]
+            writes = [r for r in new if r.msg_type != sd.RTM_GETADDR]
+            result.netlink_writes += len(writes)
+            if interface.last_applied != previous:
+                result.applies += 1
+            elif writes:
+                result.refreshes += 1
+
+            info = sd.select_prefix(ra)
+            if info is not None and info.prefix != last_prefix:
+                last_prefix = info.prefix
+                result.changes += 1
+                addr = interface.address_for(sd.RaState(info.prefix, info.prefix_len, ra.source))
+                applied = next((r for r in new if r.msg_type == sd.RTM_NEWADDR and r.addr == addr), None)
+                if applied is not None:
+                    result.latencies_ns.append(applied.time_ns - arrived_ns)
+    result.elapsed = time.perf_counter() - start
+    if interface.expiry is not None:
+        interface.expiry.cancel()
+    return result
+
+
+async def replay_binary(packets: list[tuple[str, bytes]], host_id: sd.HostId, grace: int) -> ReplayResult:
+    def events() -> Iterator[tuple[int, Optional[sd.RouterAdvert]]]:
+        # Parsing is part of the measured latency, so decode as each packet "arrives".
+        for source, payload in packets:
+            arrived = time.perf_counter_ns()
+            yield arrived, sd.decode_ra(payload, source)
+    return await replay(events(), host_id, grace)
+
+
+async def replay_text(text: str, host_id: sd.HostId, grace: int) -> ReplayResult:
+    def events() -> Iterator[tuple[int, Optional[sd.RouterAdvert]]]:
+        parser = sd.RadvdumpParser()
+        arrived = 0
+        for line in text.splitlines(True):
+            if not arrived:
+                arrived = time.perf_counter_ns()
+            ra = parser.feed(line)
+            if ra is not None:
+                yield arrived, ra
+                arrived = 0
+    return await replay(events(), host_id, grace)
+
+
+def format_latency(latencies_ns: list[int]) -> str:
+    if not latencies_ns:
+        return "n/a"
+    us = sorted(n / 1000 for n in latencies_ns)
+    p99 = us[min(len(us) - 1, int(len(us) * 0.99))]
+    return (f"min {us[0]:.1f}us  median {statistics.median(us):.1f}us  "
+            f"p99 {p99:.1f}us  max {us[-1]:.1f}us")
+
+
+def report(name: str, result: ReplayResult) -> None:
+    rate = result.ras / result.elapsed if result.elapsed else 0.0
+    redundant = result.applies - result.changes
+    print(f"{name}: {result.ras} RAs in {result.elapsed * 1000:.1f}ms ({rate:,.0f} RA/s end to end)")
+    print(f"  prefix changes {result.changes}, switchovers {result.applies} (redundant {redundant}), "
+          f"lifetime refreshes {result.refreshes}, netlink writes {result.netlink_writes} "
+          f"({result.netlink_writes / max(result.ras, 1):.2f}/RA)")
+    print(f"  change -> address applied: {format_latency(result.latencies_ns)}")
+
+
+async def run(args: argparse.Namespace) -> None:
+    packets: list[tuple[str, bytes]] = []
+    text = ""
+    for path in args.pcap:
+        packets.extend(read_pcap(path))
+    for path in args.radvdump:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            text += f.read()
+    synthetic = not packets and not text
+    if synthetic:
+        prefixes = synth_prefixes(args.count, args.change_every)
+        packets = [(ROUTER, build_ra(p)) for p in prefixes]
+        text = "".join(render_radvdump(p) for p in prefixes)
+        print(f"synthetic stream: {args.count} RAs, prefix change every {args.change_every}")
+        if args.write_samples:
+            os.makedirs(args.write_samples, exist_ok=True)
+            write_pcap(os.path.join(args.write_samples, "ra.pcap"), [p for _, p in packets])
+            with open(os.path.join(args.write_samples, "radvdump.txt"), "w", encoding="utf-8") as f:
+                f.write(text)
+            print(f"samples written to {args.write_samples}")
+    # radvdump input names the interface it was captured on; replay everything on IFACE.
+    text = sd._RE_RA_IFACE.sub(f"# received by interface {IFACE}", text) if text else text
+
+    if packets:
+        print(f"decode_ra: {bench_parse_binary(packets, args.rounds):,.0f} RA/s ({len(packets)} packets)")
+    if text:
+        rate, count = bench_parse_text(text, args.rounds)
+        print(f"radvdump parser: {rate:,.0f} RA/s ({count} blocks, {len(text.splitlines())} lines)")
+
+    host_id = sd.parse_host_id(args.host_id)
+    if packets:
+        report("raw ICMPv6 replay", await replay_binary(packets, host_id, args.grace))
+    if text:
+        report("radvdump replay", await replay_text(text, host_id, args.grace))
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description="Replay RAs through slaac-daemon and measure it.")
+    parser.add_argument("--radvdump", action="append", default=[], metavar="FILE", help="recorded radvdump output")
+    parser.add_argument("--pcap", action="append", default=[], metavar="FILE", help="pcap capture containing RAs")
+    parser.add_argument("--count", type=int, default=10000, help="synthetic RAs when no input is given (default: %(default)s)")
+    parser.add_argument("--change-every", type=int, default=100,
+                        help="synthetic prefix changes every N RAs (default: %(default)s)")
+    parser.add_argument("--rounds", type=int, default=5, help="parse benchmark rounds (default: %(default)s)")
+    parser.add_argument("--host-id", default="::1", help="host id template to replay with (default: %(default)s)")
+    parser.add_argument("--grace", type=int, default=sd.DEFAULT_GRACE)
+    parser.add_argument("--write-samples", metavar="DIR", help="save the synthetic stream as radvdump.txt + ra.pcap")
+    args = parser.parse_args(argv)
+    if args.change_every < 1:
+        parser.error("--change-every must be at least 1")
+
+    asyncio.run(run(args))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
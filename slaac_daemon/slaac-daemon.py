@@ -1,162 +1,697 @@
 #!/usr/bin/env python3
 """Simple SLAAC daemon (pure stdlib).
 
-- Runs `radvdump` and parses its output.
-- Extracts: prefix, prefix length (mask), gateway (RA source address).
-- Applies IPv6 address + default route via `ip`.
-
-Requires on target host: radvdump, iproute2.
+- Manages any number of interfaces from one asyncio process.
+- Listens for Router Advertisements on a raw ICMPv6 socket and sends its own
+  Router Solicitation; RAs are decoded in binary (prefix information, router
+  lifetime, RDNSS).
+- Alternatively (--radvdump) runs `radvdump` and parses its output blocks.
+- Applies IPv6 address + default route over rtnetlink, with the lifetimes from
+  the RA; on a prefix change the new address is added before the old one is
+  deprecated, so existing connections survive the switch.
+- The host part is configurable per interface: a fixed suffix, MAC-derived
+  (EUI-64) or stable-privacy (RFC 7217).
+
+Requires on target host: CAP_NET_RAW + CAP_NET_ADMIN (radvdump only for --radvdump).
 """
 
 import argparse
+import asyncio
+import hashlib
 import ipaddress
+import os
 import re
+import socket
+import struct
 import subprocess
 import sys
-import time
-from dataclasses import dataclass
-from typing import Optional
-
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, Optional
+
+
+ICMP6_ROUTER_SOLICIT = 133
+ICMP6_ROUTER_ADVERT = 134
+ICMP6_FILTER = 1  # linux/icmpv6.h, not exported by the socket module
+
+ND_OPT_SOURCE_LINKADDR = 1
+ND_OPT_PREFIX_INFORMATION = 3
+ND_OPT_RDNSS = 25
+
+ALL_ROUTERS = "ff02::2"
+INFINITY = 0xFFFFFFFF
+
+# RFC 4861 section 10 host constants.
+MAX_RTR_SOLICITATIONS = 3
+RTR_SOLICITATION_INTERVAL = 4.0
+
+# rtnetlink (linux/netlink.h, linux/rtnetlink.h, linux/if_addr.h)
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+NLM_F_REQUEST = 0x01
+NLM_F_ACK = 0x04
+NLM_F_REPLACE = 0x100
+NLM_F_DUMP = 0x300
+NLM_F_CREATE = 0x400
+RTM_NEWADDR = 20
+RTM_GETADDR = 22
+RTM_NEWROUTE = 24
+IFA_ADDRESS = 1
+IFA_CACHEINFO = 6
+IFA_FLAGS = 8
+IFA_F_DEPRECATED = 0x20
+RTA_OIF = 4
+RTA_GATEWAY = 5
+RTA_EXPIRES = 23
+RT_TABLE_MAIN = 254
+RTPROT_RA = 9
+RT_SCOPE_UNIVERSE = 0
+RTN_UNICAST = 1
+
+# How long a replaced address stays usable for existing connections.
+DEFAULT_GRACE = 600
+DEFAULT_SECRET_FILE = "/var/lib/slaac-daemon/stable-secret"
+
+_NLMSGHDR = struct.Struct("=IHHII")
+_IFADDRMSG = struct.Struct("=BBBBI")
+_RTMSG = struct.Struct("=BBBBBBBBI")
+_RA_HEADER = struct.Struct("!BBHBBHII")
+_PREFIX_INFO = struct.Struct("!BBIII16s")
 
 _RE_RA_FROM = re.compile(r"^#\s*based\s+on\s+Router\s+Advertisement\s+from\s+([0-9a-fA-F:]+)\s*$")
+_RE_RA_IFACE = re.compile(r"^#\s*received\s+by\s+interface\s+(\S+)\s*$")
 _RE_PREFIX = re.compile(r"^\s*prefix\s+([0-9a-fA-F:]+)\/(\d+)\s*$")
+_RE_RDNSS = re.compile(r"^\s*RDNSS\s+([0-9a-fA-F:\s]+?)\s*$")
+_RE_OPTION = re.compile(r"^\s*(Adv\w+)\s+(\S+);")
+_RE_END_INTERFACE = re.compile(r"^\s*};\s*#\s*End of interface definition")
 
 
 @dataclass(frozen=True)
-class RaState:
+class PrefixInfo:
     prefix: str
     prefix_len: int
-    gateway: str
-
+    on_link: bool
+    autonomous: bool
+    valid_lifetime: int
+    preferred_lifetime: int
 
-def calc_host_address(prefix: str, prefix_len: int) -> str:
-    # Use stdlib ipaddress for correctness; parsing itself is done via re.
-    net = ipaddress.IPv6Network(f"{prefix}/{prefix_len}", strict=False)
-    host = net.network_address + 1
-    return str(host)
 
+@dataclass
+class RouterAdvert:
+    source: str
+    router_lifetime: int = 0
+    prefixes: list[PrefixInfo] = field(default_factory=list)
+    rdnss: list[str] = field(default_factory=list)
+    rdnss_lifetime: int = 0
+    iface: Optional[str] = None
 
-def run_ip(args: list[str]) -> None:
-    subprocess.run(args, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
 
+@dataclass(frozen=True)
+class RaState:
+    prefix: str
+    prefix_len: int
+    gateway: str
 
-def apply_address(iface: str, prefix: str, prefix_len: int, gateway: str) -> None:
-    addr = calc_host_address(prefix, prefix_len)
-
-    print(f"applying: prefix={prefix}/{prefix_len} addr={addr}/{prefix_len} gw={gateway}", flush=True)
 
-    # Similar to the bash version: flush global, add address, set default route.
-    run_ip(["ip", "-6", "addr", "flush", "dev", iface, "scope", "global"])
-    run_ip(["ip", "-6", "addr", "add", f"{addr}/{prefix_len}", "dev", iface])
-    run_ip(["ip", "-6", "route", "replace", "default", "via", gateway, "dev", iface])
+def decode_ra(packet: bytes, source: str) -> Optional[RouterAdvert]:
+    """Decode an ICMPv6 Router Advertisement; returns None if malformed."""
+    if len(packet) < _RA_HEADER.size:
+        return None
+    icmp_type, code, _, _, _, router_lifetime, _, _ = _RA_HEADER.unpack_from(packet)
+    if icmp_type != ICMP6_ROUTER_ADVERT or code != 0:
+        return None
+
+    ra = RouterAdvert(source=source, router_lifetime=router_lifetime)
+    offset = _RA_HEADER.size
+    while offset + 2 <= len(packet):
+        opt_type, opt_len = packet[offset], packet[offset + 1] * 8
+        if opt_len == 0 or offset + opt_len > len(packet):
+            return None  # RFC 4861 4.6: zero-length option => discard the packet
+        body = packet[offset + 2:offset + opt_len]
+
+        if opt_type == ND_OPT_PREFIX_INFORMATION and opt_len == 32:
+            prefix_len, flags, valid, preferred, _, raw = _PREFIX_INFO.unpack(body)
+            if prefix_len <= 128:
+                ra.prefixes.append(PrefixInfo(
+                    prefix=str(ipaddress.IPv6Address(raw)),
+                    prefix_len=prefix_len,
+                    on_link=bool(flags & 0x80),
+                    autonomous=bool(flags & 0x40),
+                    valid_lifetime=valid,
+                    preferred_lifetime=preferred,
+                ))
+        elif opt_type == ND_OPT_RDNSS and opt_len >= 24:
+            ra.rdnss_lifetime = struct.unpack_from("!I", body, 2)[0]
+            for i in range(6, len(body) - 15, 16):
+                ra.rdnss.append(str(ipaddress.IPv6Address(body[i:i + 16])))
+
+        offset += opt_len
+    return ra
+
+
+def _lifetime(value: str) -> int:
+    return INFINITY if value == "infinity" else int(value)
+
+
+class RadvdumpParser:
+    """Turn radvdump output into one RouterAdvert per `interface { ... };` block.
+
+    Fed one line at a time so it works on a pipe read by the event loop. The
+    gateway comes from the block's own header comment, so a prefix is never
+    paired with the source of a different RA.
+    """
+
+    def __init__(self) -> None:
+        self.ra: Optional[RouterAdvert] = None
+        self.prefix: Optional[dict] = None
+        self.rdnss_block = False
+
+    def feed(self, raw_line: str) -> Optional[RouterAdvert]:
+        line = raw_line.rstrip("\n")
+        ra = self.ra
+
+        m = _RE_RA_FROM.match(line)
+        if m:
+            self.ra = RouterAdvert(source=m.group(1))
+            self.prefix = None
+            self.rdnss_block = False
+            return None
+        if ra is None:
+            return None
+
+        m = _RE_RA_IFACE.match(line)
+        if m:
+            ra.iface = m.group(1)
+            return None
+
+        m = _RE_PREFIX.match(line)
+        if m:
+            self.prefix = {
+                "prefix": m.group(1),
+                "prefix_len": int(m.group(2)),
+                "on_link": True,
+                "autonomous": True,
+                "valid_lifetime": 86400,  # radvd defaults
+                "preferred_lifetime": 14400,
+            }
+            ra.prefixes.append(PrefixInfo(**self.prefix))
+            return None
+
+        m = _RE_RDNSS.match(line)
+        if m:
+            ra.rdnss.extend(m.group(1).split())
+            self.prefix = None
+            self.rdnss_block = True
+            return None
+
+        m = _RE_OPTION.match(line)
+        if m:
+            key, value = m.groups()
+            prefix = self.prefix
+            if prefix is not None:
+                if key == "AdvValidLifetime":
+                    prefix["valid_lifetime"] = _lifetime(value)
+                elif key == "AdvPreferredLifetime":
+                    prefix["preferred_lifetime"] = _lifetime(value)
+                elif key == "AdvOnLink":
+                    prefix["on_link"] = value == "on"
+                elif key == "AdvAutonomous":
+                    prefix["autonomous"] = value == "on"
+                ra.prefixes[-1] = PrefixInfo(**prefix)
+            elif self.rdnss_block and key == "AdvRDNSSLifetime":
+                ra.rdnss_lifetime = _lifetime(value)
+            elif key == "AdvDefaultLifetime":
+                ra.router_lifetime = int(value)
+            return None
+
+        if _RE_END_INTERFACE.match(line):
+            self.ra = None
+            return ra
+
+        if line.strip().startswith("};"):
+            self.prefix = None
+            self.rdnss_block = False
+        return None
+
+
+def iter_radvdump(lines: Iterable[str]) -> Iterator[RouterAdvert]:
+    parser = RadvdumpParser()
+    for line in lines:
+        ra = parser.feed(line)
+        if ra is not None:
+            yield ra
 
 
-def monitor_radvdump(iface: str) -> None:
-    last_applied: Optional[RaState] = None
-    gateway: Optional[str] = None
+@dataclass(frozen=True)
+class HostId:
+    """How the interface identifier (host part) of the address is chosen.
+
+    fixed:  a constant suffix, e.g. `::1` (the historical default)
+    eui64:  modified EUI-64 from the interface MAC (RFC 4291 appendix A)
+    stable: stable, semantically opaque identifier (RFC 7217)
+    """
+
+    kind: str
+    suffix: int = 1
+
+
+def parse_host_id(spec: str) -> HostId:
+    if spec in ("eui64", "stable"):
+        return HostId(kind=spec)
+    try:
+        return HostId(kind="fixed", suffix=int(ipaddress.IPv6Address(spec)))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"bad host id {spec!r}: expected a suffix like ::1, eui64 or stable") from None
+
+
+def load_secret(path: str) -> bytes:
+    """Secret key for stable host ids, generated on first use and kept across reboots."""
+    try:
+        with open(path, "rb") as f:
+            secret = f.read()
+        if len(secret) >= 16:
+            return secret
+    except FileNotFoundError:
+        pass
+    secret = os.urandom(16)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(secret)
+    return secret
+
+
+def interface_id(host_id: HostId, iface: str, prefix: str, prefix_len: int, secret: bytes = b"") -> int:
+    net = ipaddress.IPv6Network(f"{prefix}/{prefix_len}", strict=False)
+    if host_id.kind == "fixed":
+        return host_id.suffix
 
-    while True:
-        print(f"starting radvdump on {iface}...", flush=True)
-        try:
-            proc = subprocess.Popen(
-                ["radvdump"],
-                stdin=subprocess.DEVNULL,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.DEVNULL,
-                text=True,
-                bufsize=1,
-            )
-        except FileNotFoundError:
-            print("error: radvdump not found in PATH", flush=True)
-            raise
-
-        # After listener is up, send one RS to solicit an RA (ignore output).
-        try:
-            subprocess.run(
-                ["rdisc6", "-1", "-q", iface],
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-                check=False,
-                timeout=5,
-                text=True,
-            )
-        except FileNotFoundError:
-            print("warn: rdisc6 not found in PATH; waiting for unsolicited RA", flush=True)
-        except subprocess.TimeoutExpired:
-            print("warn: rdisc6 timed out; waiting for unsolicited RA", flush=True)
+    if host_id.kind == "eui64":
+        mac = link_address(iface)
+        if mac is None:
+            raise ValueError(f"{iface} has no MAC address for an EUI-64 host id")
+        eui = bytes([mac[0] ^ 0x02]) + mac[1:3] + b"\xff\xfe" + mac[3:]
+        return int.from_bytes(eui, "big")
 
-        try:
-            assert proc.stdout is not None
-            for raw_line in proc.stdout:
-                line = raw_line.rstrip("\n")
-
-                m = _RE_RA_FROM.match(line)
-                if m:
-                    gateway = m.group(1)
-                    print(f"gateway received: {gateway}", flush=True)
-                    continue
+    # RFC 7217: RID = F(Prefix, Net_Iface, Network_ID, DAD_Counter, secret_key),
+    # SHA-256 as F, no Network_ID, DAD_Counter 0.
+    digest = hashlib.sha256(net.network_address.packed[:(prefix_len + 7) // 8]
+                            + iface.encode() + b"\0" + secret).digest()
+    return int.from_bytes(digest[:16], "big")
 
-                m = _RE_PREFIX.match(line)
-                if not m:
-                    continue
 
-                prefix = m.group(1)
-                prefix_len = int(m.group(2))
-                print(f"prefix received: {prefix}/{prefix_len}", flush=True)
+def calc_host_address(prefix: str, prefix_len: int, iid: int = 1) -> str:
+    # Use stdlib ipaddress for correctness; parsing itself is done via re.
+    net = ipaddress.IPv6Network(f"{prefix}/{prefix_len}", strict=False)
+    host = net.network_address + (iid & ((1 << (128 - prefix_len)) - 1))
+    return str(host)
 
-                if not gateway:
-                    print("warn: got prefix but no gateway yet; skipping apply", flush=True)
-                    continue
 
-                new_state = RaState(prefix=prefix, prefix_len=prefix_len, gateway=gateway)
-                if new_state == last_applied:
+class Netlink:
+    """Minimal rtnetlink client: one request at a time, waits for the kernel ACK."""
+
+    def __init__(self) -> None:
+        self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE)
+        self.sock.bind((0, 0))
+        self.seq = 0
+
+    def close(self) -> None:
+        self.sock.close()
+
+    def request(self, msg_type: int, flags: int, body: bytes) -> list[tuple[int, bytes]]:
+        """Send one message; returns (type, payload) of replies for dumps, raises OSError on NACK."""
+        self.seq += 1
+        header = _NLMSGHDR.pack(_NLMSGHDR.size + len(body), msg_type, flags | NLM_F_REQUEST | NLM_F_ACK, self.seq, 0)
+        self.sock.send(header + body)
+
+        replies = []
+        while True:
+            data = self.sock.recv(65536)
+            offset = 0
+            while offset + _NLMSGHDR.size <= len(data):
+                length, reply_type, _, seq, _ = _NLMSGHDR.unpack_from(data, offset)
+                if length < _NLMSGHDR.size:
+                    break
+                payload = data[offset + _NLMSGHDR.size:offset + length]
+                offset += (length + 3) & ~3
+                if seq != self.seq:
                     continue
+                if reply_type == NLMSG_DONE:
+                    return replies
+                if reply_type == NLMSG_ERROR:
+                    error = struct.unpack_from("=i", payload)[0]
+                    if error:
+                        raise OSError(-error, os.strerror(-error))
+                    return replies
+                replies.append((reply_type, payload))
+
+
+def nl_attr(attr_type: int, data: bytes) -> bytes:
+    attr = struct.pack("=HH", 4 + len(data), attr_type) + data
+    return attr + b"\0" * (-len(attr) % 4)
+
+
+def iter_attrs(data: bytes, offset: int) -> Iterator[tuple[int, bytes]]:
+    while offset + 4 <= len(data):
+        length, attr_type = struct.unpack_from("=HH", data, offset)
+        if length < 4:
+            break
+        yield attr_type, data[offset + 4:offset + length]
+        offset += (length + 3) & ~3
+
+
+def set_address(nl: Netlink, ifindex: int, addr: str, prefix_len: int, valid: int, preferred: int) -> None:
+    """Add the address, or update its lifetimes if it already exists (RTM_NEWADDR + NLM_F_REPLACE)."""
+    body = _IFADDRMSG.pack(socket.AF_INET6, prefix_len, 0, RT_SCOPE_UNIVERSE, ifindex)
+    body += nl_attr(IFA_ADDRESS, ipaddress.IPv6Address(addr).packed)
+    # INFINITY in both fields makes the address permanent; cstamp/tstamp are ignored on input.
+    body += nl_attr(IFA_CACHEINFO, struct.pack("=IIII", preferred, valid, 0, 0))
+    nl.request(RTM_NEWADDR, NLM_F_CREATE | NLM_F_REPLACE, body)
+
+
+def list_addresses(nl: Netlink, ifindex: int) -> list[tuple[str, int, int]]:
+    """Global IPv6 addresses on the interface as (address, prefix length, flags)."""
+    body = _IFADDRMSG.pack(socket.AF_INET6, 0, 0, 0, 0)
+    result = []
+    for reply_type, payload in nl.request(RTM_GETADDR, NLM_F_DUMP, body):
+        if reply_type != RTM_NEWADDR:
+            continue
+        family, prefix_len, flags, scope, index = _IFADDRMSG.unpack_from(payload)
+        if family != socket.AF_INET6 or index != ifindex or scope != RT_SCOPE_UNIVERSE:
+            continue
+        addr = None
+        for attr_type, data in iter_attrs(payload, _IFADDRMSG.size):
+            if attr_type == IFA_ADDRESS:
+                addr = str(ipaddress.IPv6Address(data))
+            elif attr_type == IFA_FLAGS:
+                flags = struct.unpack("=I", data)[0]
+        if addr:
+            result.append((addr, prefix_len, flags))
+    return result
+
+
+def replace_default_route(nl: Netlink, ifindex: int, gateway: str, lifetime: int) -> None:
+    """`ip -6 route replace default via GATEWAY dev IFACE expires LIFETIME`"""
+    body = _RTMSG.pack(socket.AF_INET6, 0, 0, 0, RT_TABLE_MAIN, RTPROT_RA, RT_SCOPE_UNIVERSE, RTN_UNICAST, 0)
+    body += nl_attr(RTA_GATEWAY, ipaddress.IPv6Address(gateway).packed)
+    body += nl_attr(RTA_OIF, struct.pack("=I", ifindex))
+    body += nl_attr(RTA_EXPIRES, struct.pack("=I", lifetime))
+    nl.request(RTM_NEWROUTE, NLM_F_CREATE | NLM_F_REPLACE, body)
+
+
+def apply_address(nl: Netlink, iface: str, addr: str, state: RaState, info: PrefixInfo,
+                  router_lifetime: int, grace: int) -> None:
+    """Switch to the new address without a connectivity gap.
+
+    The new address is added first, then every other global address is deprecated
+    (preferred lifetime 0): new connections use the new address while existing ones
+    keep working, and the kernel removes the old ones when their valid lifetime
+    (the grace period) runs out.
+    """
+    ifindex = socket.if_nametoindex(iface)
+
+    print(f"{iface}: applying: prefix={state.prefix}/{state.prefix_len} addr={addr}/{state.prefix_len} "
+          f"gw={state.gateway} valid={info.valid_lifetime} preferred={info.preferred_lifetime}", flush=True)
+
+    set_address(nl, ifindex, addr, state.prefix_len, info.valid_lifetime, info.preferred_lifetime)
+    if router_lifetime:
+        replace_default_route(nl, ifindex, state.gateway, router_lifetime)
+
+    for old, old_len, flags in list_addresses(nl, ifindex):
+        if old == addr or flags & IFA_F_DEPRECATED:
+            continue
+        print(f"{iface}: deprecating {old}/{old_len}, removed in {grace}s", flush=True)
+        set_address(nl, ifindex, old, old_len, grace, 0)
+
+
+def refresh_lifetimes(nl: Netlink, iface: str, addr: str, state: RaState, info: PrefixInfo,
+                      router_lifetime: int) -> None:
+    """Same RA again: only push the new lifetimes so the address and route do not expire."""
+    ifindex = socket.if_nametoindex(iface)
+    set_address(nl, ifindex, addr, state.prefix_len, info.valid_lifetime, info.preferred_lifetime)
+    if router_lifetime:
+        replace_default_route(nl, ifindex, state.gateway, router_lifetime)
+
+
+def select_prefix(ra: RouterAdvert) -> Optional[PrefixInfo]:
+    """Pick the prefix to apply from an RA, or None if it has none.
+
+    Router lifetime 0 only means the sender is not a default router (RFC 4861 4.2);
+    its autonomous prefixes are still valid for SLAAC.
+    """
+    for info in ra.prefixes:
+        # RFC 4862 5.5.3: ignore prefixes whose preferred lifetime exceeds the valid lifetime.
+        if info.autonomous and 0 < info.valid_lifetime and info.preferred_lifetime <= info.valid_lifetime:
+            return info
+    return None
+
+
+class Interface:
+    """SLAAC state of one managed interface; every method runs on the event loop."""
+
+    def __init__(self, daemon: "Daemon", name: str, host_id: HostId) -> None:
+        self.daemon = daemon
+        self.name = name
+        self.host_id = host_id
+        self.last_applied: Optional[RaState] = None
+        self.expiry: Optional[asyncio.TimerHandle] = None
+        self.ra_received = asyncio.Event()
+        self.solicit_task: Optional[asyncio.Task] = None
+
+    def address_for(self, state: RaState) -> str:
+        iid = interface_id(self.host_id, self.name, state.prefix, state.prefix_len, self.daemon.secret)
+        return calc_host_address(state.prefix, state.prefix_len, iid)
+
+    def handle_ra(self, ra: RouterAdvert) -> None:
+        """Apply the RA if it changes anything, otherwise refresh lifetimes."""
+        self.ra_received.set()
+        prefixes = ", ".join(f"{p.prefix}/{p.prefix_len}" for p in ra.prefixes) or "none"
+        print(f"{self.name}: RA from {ra.source}: lifetime={ra.router_lifetime} prefixes={prefixes}"
+              + (f" rdnss={','.join(ra.rdnss)}" if ra.rdnss else ""), flush=True)
+
+        info = select_prefix(ra)
+        if info is None:
+            return
+        new_state = RaState(prefix=info.prefix, prefix_len=info.prefix_len, gateway=ra.source)
+        last_applied = self.last_applied
 
+        try:
+            addr = self.address_for(new_state)
+            if new_state == last_applied:
+                refresh_lifetimes(self.daemon.nl, self.name, addr, new_state, info, ra.router_lifetime)
+            else:
                 print(
-                    f"change detected: "
-                    f"{(last_applied.prefix + '/' + str(last_applied.prefix_len)) if last_applied else 'None'} -> {prefix}/{prefix_len}, "
-                    f"gw={(last_applied.gateway if last_applied else 'None')} -> {gateway}",
+                    f"{self.name}: change detected: "
+                    f"{(last_applied.prefix + '/' + str(last_applied.prefix_len)) if last_applied else 'None'} -> {new_state.prefix}/{new_state.prefix_len}, "
+                    f"gw={(last_applied.gateway if last_applied else 'None')} -> {new_state.gateway}",
                     flush=True,
                 )
-
-                try:
-                    apply_address(iface, prefix, prefix_len, gateway)
-                except subprocess.CalledProcessError as e:
-                    stderr = (e.stderr or "").strip()
-                    print(f"error: ip command failed: {e.cmd}; stderr={stderr}", flush=True)
-                    continue
-                last_applied = new_state
-        finally:
+                apply_address(self.daemon.nl, self.name, addr, new_state, info, ra.router_lifetime,
+                              min(self.daemon.grace, info.valid_lifetime))
+        except (OSError, ValueError) as e:
+            print(f"{self.name}: error: applying RA failed: {e}", flush=True)
+            return
+        self.last_applied = new_state
+        # A router lifetime of 0 installs no default route, so only the address lifetime counts.
+        self.schedule_expiry(min(info.valid_lifetime, ra.router_lifetime) if ra.router_lifetime
+                             else info.valid_lifetime)
+
+    def schedule_expiry(self, lifetime: int) -> None:
+        # The kernel drops the address/route by itself; the timer only makes us forget
+        # the state and go looking for a router again.
+        if self.expiry is not None:
+            self.expiry.cancel()
+            self.expiry = None
+        if lifetime != INFINITY:
+            self.expiry = asyncio.get_running_loop().call_later(lifetime, self.expire)
+
+    def expire(self) -> None:
+        self.expiry = None
+        print(f"{self.name}: lifetime of {self.last_applied} expired without a new RA", flush=True)
+        self.last_applied = None
+        self.start_solicit()
+
+    def start_solicit(self) -> None:
+        if self.solicit_task is None or self.solicit_task.done():
+            self.ra_received.clear()
+            self.solicit_task = asyncio.create_task(self.solicit())
+
+    async def solicit(self) -> None:
+        """Send up to MAX_RTR_SOLICITATIONS RS until the first RA arrives."""
+        for _ in range(MAX_RTR_SOLICITATIONS):
+            self.daemon.send_rs(self.name)
             try:
-                proc.stdout and proc.stdout.close()
-            except Exception:
+                await asyncio.wait_for(self.ra_received.wait(), RTR_SOLICITATION_INTERVAL)
+                return
+            except asyncio.TimeoutError:
                 pass
-
-            # Ensure process is gone.
+        print(f"{self.name}: no RA after {MAX_RTR_SOLICITATIONS} solicitations; waiting for unsolicited RA",
+              flush=True)
+
+
+def open_icmp6_socket() -> socket.socket:
+    """One raw socket for every interface; the receiving interface comes from the scope id."""
+    sock = socket.socket(socket.AF_INET6, socket.SOCK_RAW, socket.IPPROTO_ICMPV6)
+    sock.setblocking(False)
+
+    # Only let Router Advertisements through (a set bit blocks that type).
+    blocked = [0xFFFFFFFF] * 8
+    blocked[ICMP6_ROUTER_ADVERT >> 5] &= ~(1 << (ICMP6_ROUTER_ADVERT & 31))
+    sock.setsockopt(socket.IPPROTO_ICMPV6, ICMP6_FILTER, struct.pack("=8I", *blocked))
+
+    # Needed to check the RA hop limit; RS must go out with hop limit 255.
+    sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_RECVHOPLIMIT, 1)
+    sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_MULTICAST_HOPS, 255)
+    return sock
+
+
+def link_address(iface: str) -> Optional[bytes]:
+    try:
+        with open(f"/sys/class/net/{iface}/address") as f:
+            mac = bytes.fromhex(f.read().strip().replace(":", ""))
+    except (OSError, ValueError):
+        return None
+    return mac if len(mac) == 6 and any(mac) else None
+
+
+def build_rs(mac: Optional[bytes]) -> bytes:
+    # The kernel fills in the ICMPv6 checksum on raw IPPROTO_ICMPV6 sockets.
+    packet = struct.pack("!BBHI", ICMP6_ROUTER_SOLICIT, 0, 0, 0)
+    if mac:
+        packet += struct.pack("!BB6s", ND_OPT_SOURCE_LINKADDR, 1, mac)
+    return packet
+
+
+def recv_ra(sock: socket.socket) -> tuple[int, Optional[RouterAdvert]]:
+    """Read one packet; returns (receiving ifindex, RA or None if it is not a valid RA)."""
+    packet, ancdata, _, addr = sock.recvmsg(65535, socket.CMSG_SPACE(4))
+    hop_limit = None
+    for level, kind, data in ancdata:
+        if level == socket.IPPROTO_IPV6 and kind == socket.IPV6_HOPLIMIT:
+            hop_limit = struct.unpack("=i", data[:4])[0]
+    source = addr[0].split("%", 1)[0]
+
+    # RFC 4861 6.1.2: only accept RAs that were not forwarded, from a link-local source.
+    if hop_limit != 255 or not ipaddress.IPv6Address(source).is_link_local:
+        return addr[3], None
+    return addr[3], decode_ra(packet, source)
+
+
+class Daemon:
+    """All managed interfaces in one process: one raw ICMPv6 socket, one netlink socket."""
+
+    def __init__(self, host_ids: dict[str, HostId], grace: int, secret: bytes = b"") -> None:
+        self.grace = grace
+        self.secret = secret
+        self.nl = Netlink()
+        self.sock: Optional[socket.socket] = None
+        self.interfaces = {name: Interface(self, name, host_id) for name, host_id in host_ids.items()}
+
+    def send_rs(self, iface: str) -> None:
+        if self.sock is None:
+            self.sock = open_icmp6_socket()
+        try:
+            # For link-local multicast the scope id selects the outgoing interface.
+            self.sock.sendto(build_rs(link_address(iface)), (ALL_ROUTERS, 0, 0, socket.if_nametoindex(iface)))
+        except OSError as e:
+            print(f"{iface}: warn: sending router solicitation failed: {e}", flush=True)
+
+    def dispatch(self, ra: RouterAdvert) -> None:
+        interface = self.interfaces.get(ra.iface) if ra.iface else None
+        if interface is not None:
+            interface.handle_ra(ra)
+
+    def on_icmp6_readable(self) -> None:
+        assert self.sock is not None
+        while True:
             try:
-                proc.terminate()
-            except Exception:
-                pass
+                ifindex, ra = recv_ra(self.sock)
+            except BlockingIOError:
+                return
+            if ra is None:
+                continue
+            try:
+                ra.iface = socket.if_indextoname(ifindex)
+            except OSError:
+                continue
+            self.dispatch(ra)
+
+    async def run(self) -> None:
+        self.sock = open_icmp6_socket()
+        asyncio.get_running_loop().add_reader(self.sock, self.on_icmp6_readable)
+        print(f"listening for RA on {', '.join(self.interfaces)} (raw ICMPv6)", flush=True)
+        for interface in self.interfaces.values():
+            interface.start_solicit()
+        await asyncio.Event().wait()
+
+    async def run_radvdump(self) -> None:
+        while True:
+            print("starting radvdump...", flush=True)
             try:
-                proc.wait(timeout=2)
-            except Exception:
-                try:
-                    proc.kill()
-                except Exception:
-                    pass
+                proc = await asyncio.create_subprocess_exec(
+                    "radvdump",
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL,
+                )
+            except FileNotFoundError:
+                print("error: radvdump not found in PATH", flush=True)
+                raise
 
-        print("radvdump exited; restarting in 1s", flush=True)
-        time.sleep(1)
+            # After listener is up, solicit an RA on every interface.
+            for interface in self.interfaces.values():
+                interface.start_solicit()
+
+            parser = RadvdumpParser()
+            try:
+                assert proc.stdout is not None
+                async for raw_line in proc.stdout:
+                    ra = parser.feed(raw_line.decode(errors="replace"))
+                    # radvdump listens on every interface.
+                    if ra is not None:
+                        self.dispatch(ra)
+            finally:
+                if proc.returncode is None:
+                    proc.terminate()
+                    try:
+                        await asyncio.wait_for(proc.wait(), 2)
+                    except asyncio.TimeoutError:
+                        proc.kill()
+
+            print("radvdump exited; restarting in 1s", flush=True)
+            await asyncio.sleep(1)
 
 
 def main(argv: list[str]) -> int:
-    parser = argparse.ArgumentParser(description="Simple SLAAC daemon (parse radvdump output).")
-    parser.add_argument("iface", help="network interface, e.g. eth0")
+    parser = argparse.ArgumentParser(description="Simple SLAAC daemon (listens for Router Advertisements).")
+    parser.add_argument("ifaces", nargs="+", metavar="IFACE[=HOST_ID]",
+                        help="interfaces to manage, e.g. eth0 eth0.10=::53 br0=stable; "
+                             "HOST_ID overrides --host-id for that interface")
+    parser.add_argument("--host-id", type=parse_host_id, default=parse_host_id("::1"),
+                        help="default host part: a suffix like ::1, eui64 (MAC-derived) "
+                             "or stable (RFC 7217) (default: ::1)")
+    parser.add_argument("--secret-file", default=DEFAULT_SECRET_FILE,
+                        help="secret key for stable host ids (default: %(default)s)")
+    parser.add_argument("--grace", type=int, default=DEFAULT_GRACE,
+                        help="seconds a replaced address stays valid for existing connections (default: %(default)s)")
+    parser.add_argument("--radvdump", action="store_true",
+                        help="parse `radvdump` output instead of listening on a raw ICMPv6 socket")
     args = parser.parse_args(argv)
 
-    iface = args.iface
-    print(f"slaac-daemon starting on {iface}", flush=True)
-    monitor_radvdump(iface)
+    host_ids: dict[str, HostId] = {}
+    for spec in args.ifaces:
+        name, sep, host_id = spec.partition("=")
+        try:
+            host_ids[name] = parse_host_id(host_id) if sep else args.host_id
+        except argparse.ArgumentTypeError as e:
+            parser.error(str(e))
+
+    secret = b""
+    if any(h.kind == "stable" for h in host_ids.values()):
+        secret = load_secret(args.secret_file)
+
+    print(f"slaac-daemon starting on {', '.join(host_ids)}", flush=True)
+    daemon = Daemon(host_ids, args.grace, secret)
+    asyncio.run(daemon.run_radvdump() if args.radvdump else daemon.run())
     return 0
 
 
@@ -13,45 +13,67 @@ PROXY_URL = "http://127.0.0.1:8000"
 QBITTORRENT_API = "http://127.0.0.1:8080"
 TRACKERSLIST_BEST = "https://raw.githubusercontent.com/ngosang/trackerslist/master/trackers_best.txt"
 TRACKERSLIST_ALL = "https://raw.githubusercontent.com/ngosang/trackerslist/master/trackers_all.txt"
+DNS_TTL = 300  # 解析结果缓存时间（秒），所有探测共享
+DNS_NEGATIVE_TTL = 60  # 解析失败的域名也缓存一段时间，避免反复查询失效域名
+UDP_RCVBUF = 1 << 20  # 共用UDP端点的接收缓冲区，响应集中到达时不丢包
 
 class TrackerChecker:
     def __init__(self,
                  proxy_url=PROXY_URL,
                  trackers_url=TRACKERSLIST_ALL,
                  timeout=2,
-                 best_tracker_count=20):
+                 best_tracker_count=20,
+                 concurrency=30):
         self.proxy_url = proxy_url
         self.trackers_url = trackers_url
         self.timeout = timeout
         self.best_tracker_count = best_tracker_count
+        self.concurrency = concurrency
         self.trackers = []
+        # 每次运行共用的 UDP 端点（family -> (transport, protocol)）和 HTTP 会话
+        self._udp_endpoints = {}
+        self._http_session = None
+        # hostname -> (过期时间, [(family, ip), ...]，解析失败时为空列表)
+        self._dns_cache = {}
+        # 正在解析的 hostname -> Future，同一域名的并发查询只发一次
+        self._dns_pending = {}
+
+    class UdpDemuxProtocol(asyncio.DatagramProtocol):
+        """所有UDP探测共用一个端点，按 BEP 15 的 transaction_id 把响应分发给等待中的 Future"""
 
-    class MyProtocol(asyncio.DatagramProtocol):
         def __init__(self):
             super().__init__()
-            self.datagram_future = asyncio.Future()
-            self._transport = None  # 添加传输对象引用
-
-        def connection_made(self, transport):
-            self._transport = transport
+            # transaction_id -> (Future, 目标地址)
+            self.waiters = {}
+            # 最近一次发送失败的异常，由 sendto 同步触发的 error_received 写入
+            self.send_error = None
 
         def datagram_received(self, data, addr):
-            # 仅当Future未完成时设置结果
-            if not self.datagram_future.done():
-                self.datagram_future.set_result(data)
-                # 收到响应后立即关闭传输
-                self._transport.close()
+            if len(data) < 8:
+                return
+            _, transaction_id = struct.unpack(">LL", data[:8])
+            waiter = self.waiters.get(transaction_id)
+            # 只接受来自探测目标的响应
+            if waiter and not waiter[0].done() and waiter[1] == addr[:2]:
+                waiter[0].set_result(data)
 
         def error_received(self, exc):
-            if not self.datagram_future.done():
-                self.datagram_future.set_exception(exc)
+            # transport.sendto 立即发送失败时会同步回调这里，记下来由发送方当场判定失败；
+            # 其余异步到达的错误无法对应到具体探测，交给各自的超时处理
+            self.send_error = exc
 
         def connection_lost(self, exc):
-            # 连接关闭时处理未完成的Future
-            if not self.datagram_future.done():
-                self.datagram_future.set_exception(
-                    ConnectionError("Connection lost")
-                )
+            for future, _ in self.waiters.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("Connection lost"))
+
+        def register(self, addr):
+            transaction_id = random.randint(0, 0xFFFFFFFF)
+            while transaction_id in self.waiters:
+                transaction_id = random.randint(0, 0xFFFFFFFF)
+            future = asyncio.get_running_loop().create_future()
+            self.waiters[transaction_id] = (future, addr)
+            return transaction_id, future
 
     def fetch_trackers(self):
         proxies = {
@@ -68,28 +90,82 @@ class TrackerChecker:
             print(f"Error fetching trackers: {e}")
             self.trackers = []
 
+    async def _resolve(self, hostname):
+        now = time.monotonic()
+        cached = self._dns_cache.get(hostname)
+        if cached and cached[0] > now:
+            return cached[1]
+
+        pending = self._dns_pending.get(hostname)
+        if pending:
+            # 发起解析的探测被取消时，不能连带取消其他等待者
+            return await asyncio.shield(pending)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._dns_pending[hostname] = future
+        result = []
+        try:
+            infos = await asyncio.wait_for(
+                loop.getaddrinfo(hostname, None, type=socket.SOCK_DGRAM),
+                timeout=self.timeout * 2,
+            )
+            # A 和 AAAA 各取第一个地址即可
+            addresses = {}
+            for family, _, _, _, sockaddr in infos:
+                if family in (socket.AF_INET, socket.AF_INET6):
+                    addresses.setdefault(family, (family, sockaddr[0]))
+            result = list(addresses.values())
+        except (OSError, asyncio.TimeoutError):
+            pass
+        finally:
+            # 被取消时也要唤醒等待同一域名的其他探测
+            del self._dns_pending[hostname]
+            if not future.done():
+                future.set_result(result)
+
+        ttl = DNS_TTL if result else DNS_NEGATIVE_TTL
+        self._dns_cache[hostname] = (time.monotonic() + ttl, result)
+        return result
+
     async def _test_udp_tracker(self, hostname, port):
+        addresses = await self._resolve(hostname)
+        if not addresses:
+            return False
+
+        # IPv4 和 IPv6 同时探测，第一个成功的即为结果，其余的取消
+        pending = {asyncio.ensure_future(self._test_udp_address(family, (ip, port))) for family, ip in addresses}
         try:
-            host = socket.gethostbyname(hostname)
-        except socket.gaierror:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.result() is not False:
+                        return task.result()
+            return False
+        finally:
+            for task in pending:
+                task.cancel()
+            # 等被取消的探测清理完各自登记的 transaction_id
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _test_udp_address(self, family, addr):
+        endpoint = self._udp_endpoints.get(family)
+        if endpoint is None:
             return False
+        transport, protocol = endpoint
 
-        transaction_id = random.randint(0, 0xFFFFFFFF)
+        transaction_id, future = protocol.register(addr)
         connection_id = 0x41727101980
         packet = struct.pack(">QLL", connection_id, 0, transaction_id)
 
-        loop = asyncio.get_running_loop()
         try:
-            transport, protocol = await loop.create_datagram_endpoint(
-                self.MyProtocol, local_addr=('0.0.0.0', 0)
-            )
-            transport.sendto(packet, (host, port))
+            protocol.send_error = None
+            transport.sendto(packet, addr)
+            if protocol.send_error is not None:
+                # 如网络不可达，不必等到超时
+                return False
             start_time = time.time()
-        except Exception as e:
-            return False
-
-        try:
-            response = await asyncio.wait_for(protocol.datagram_future, timeout=self.timeout)
+            response = await asyncio.wait_for(future, timeout=self.timeout)
             if len(response) >= 16:
                 action, res_transaction_id = struct.unpack(">LL", response[:8])
                 if action == 0 and res_transaction_id == transaction_id:
@@ -97,20 +173,48 @@ class TrackerChecker:
         except (asyncio.TimeoutError, Exception):
             return False
         finally:
-            transport.close()
+            protocol.waiters.pop(transaction_id, None)
 
         return False
 
     async def _test_http_tracker(self, url):
         try:
-            async with aiohttp.ClientSession() as session:
-                start_time = time.time()
-                async with session.get(url, timeout=self.timeout) as response:
-                    if response.status == 200:
-                        return (time.time() - start_time) * 1000
+            start_time = time.time()
+            async with self._http_session.get(url) as response:
+                # 读完响应体，连接才能放回连接池复用
+                await response.read()
+                if response.status == 200:
+                    return (time.time() - start_time) * 1000
         except Exception:
             return False
 
+    async def _open_sessions(self):
+        # IPv4 和 IPv6 各一个UDP端点，本机没有IPv6时只用IPv4
+        loop = asyncio.get_running_loop()
+        for family, local_addr in ((socket.AF_INET, ('0.0.0.0', 0)), (socket.AF_INET6, ('::', 0))):
+            try:
+                transport, protocol = await loop.create_datagram_endpoint(
+                    self.UdpDemuxProtocol, local_addr=local_addr, family=family
+                )
+                transport.get_extra_info('socket').setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, UDP_RCVBUF)
+                self._udp_endpoints[family] = (transport, protocol)
+            except OSError as e:
+                print(f"UDP endpoint for {family.name} unavailable: {e}")
+
+        # 一次运行共用一个HTTP连接池，DNS 结果也在连接器里缓存
+        connector = aiohttp.TCPConnector(limit=self.concurrency, ttl_dns_cache=DNS_TTL)
+        self._http_session = aiohttp.ClientSession(
+            connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout)
+        )
+
+    async def _close_sessions(self):
+        for transport, _ in self._udp_endpoints.values():
+            transport.close()
+        self._udp_endpoints = {}
+        if self._http_session is not None:
+            await self._http_session.close()
+            self._http_session = None
+
     async def _check_tracker(self, tracker):
         parsed = urlparse(tracker)
         if parsed.scheme not in ("udp", "http", "https"):
@@ -150,21 +254,24 @@ class TrackerChecker:
             return []
 
         async def _run():
-            semaphore = asyncio.Semaphore(30)
-            results = []
+            semaphore = asyncio.Semaphore(self.concurrency)
 
             async def sem_task(tracker):
                 async with semaphore:
                     return await self._check_tracker(tracker)
 
-            tasks = []
-            for t in self.trackers:
-                # 控制任务添加间隔为50ms
-                await asyncio.sleep(0.05)
-                task = asyncio.create_task(sem_task(t))
-                tasks.append(task)
-
-            raw_results = await asyncio.gather(*tasks)
+            await self._open_sessions()
+            try:
+                tasks = []
+                for t in self.trackers:
+                    # 控制任务添加间隔为50ms
+                    await asyncio.sleep(0.05)
+                    task = asyncio.create_task(sem_task(t))
+                    tasks.append(task)
+
+                raw_results = await asyncio.gather(*tasks)
+            finally:
+                await self._close_sessions()
             return raw_results
 
         results = asyncio.run(_run())